@@ -166,8 +166,8 @@ class Settings(BaseSettings):
     # —— 队列与工作者 ——
     WORKER_COUNT: int = Field(
         default=2,
-        description="处理媒体文件的工作者协程数量",
-        ge=1,
+        description="处理媒体文件的工作者协程数量，即同时处理的文件数上限；0 表示根据 CPU 核心数与文件描述符上限自动计算（最多 10 个）",
+        ge=0,
         le=10
     )
     
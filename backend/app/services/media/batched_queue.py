@@ -0,0 +1,54 @@
+"""队列批量读取工具
+
+为 Worker 提供一次取出多个任务的能力，减少逐个 await queue.get() 带来的事件循环往返。
+"""
+
+import asyncio
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+async def get_many(
+    queue: asyncio.Queue[T],
+    max_items: int,
+    max_wait_s: float
+) -> list[T]:
+    """从队列中批量取出任务
+
+    队列为空时才阻塞等待第一个任务，然后在 max_wait_s 时间窗口内继续收集，
+    直到凑满 max_items 个或窗口结束。已在队列中的任务（包括第一个）都通过 get_nowait() 直接取出，
+    不经过 await queue.get()。
+
+    Args:
+        queue: 异步队列
+        max_items: 单次最多取出的任务数量
+        max_wait_s: 取到第一个任务后，等待更多任务的最长时间（秒），0 表示只取已就绪的任务
+
+    Returns:
+        list[T]: 取出的任务列表，至少包含一个元素
+    """
+    try:
+        first = queue.get_nowait()
+    except asyncio.QueueEmpty:
+        first = await queue.get()
+    items = [first]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_wait_s
+
+    while len(items) < max_items:
+        try:
+            items.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            items.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+        except TimeoutError:
+            break
+
+    return items
@@ -22,7 +22,9 @@ from . import status_manager
 async def process_media_file(
     media_file_id: int,
     db_session_factory: Callable[[], Session], 
-    settings: Settings
+    settings: Settings,
+    *,
+    mark_processing: bool = True
 ) -> ProcessResult:
     """处理媒体文件的核心函数
     
@@ -30,12 +32,14 @@ async def process_media_file(
         media_file_id: 待处理的媒体文件ID
         db_session_factory: 数据库会话工厂函数
         settings: 应用配置
+        mark_processing: 是否在开始时将状态更新为PROCESSING；
+            调用方已批量更新过状态时（如 Worker）传 False，避免重复 UPDATE
         
     Returns:
         ProcessResult: 处理结果，包含成功状态、消息和文件ID
         
     处理流程：
-    1. 更新状态为PROCESSING
+    1. 更新状态为PROCESSING（mark_processing 为 True 时）
     2. LLM分析文件名（如果启用）
     3. TMDB匹配信息（如果启用且LLM分析成功）
     4. 创建硬链接并更新路径
@@ -59,8 +63,9 @@ async def process_media_file(
             original_filepath = media_file.original_filepath
         
         # 设置为处理中状态
-        status_manager.set_processing(db_session_factory, media_file_id)
-        ctx_logger.info("已将文件状态更新为 PROCESSING")
+        if mark_processing:
+            status_manager.set_processing(db_session_factory, media_file_id)
+            ctx_logger.info("已将文件状态更新为 PROCESSING")
         
     except Exception as e:
         ctx_logger.error(f"初始状态更新失败: {e}")
@@ -7,9 +7,11 @@
 """
 
 import asyncio
+import contextlib
 import os
+import stat
 from pathlib import Path
-from typing import Set, Callable, List
+from typing import Callable, Iterable, Iterator, List
 
 from loguru import logger
 from sqlmodel import Session
@@ -21,7 +23,7 @@ from ...config import Settings
 SCANNER_LOG_PREFIX = "[Scanner]"
 
 
-def _parse_video_extensions(exts: str) -> set[str]:
+def _parse_video_extensions(exts: str) -> frozenset[str]:
     """
     解析视频扩展名字符串，返回标准化的扩展名集合。
     
@@ -29,10 +31,10 @@ def _parse_video_extensions(exts: str) -> set[str]:
         exts: 逗号分隔的扩展名字符串（如 "mp4,mkv,avi" 或 ".mp4, .mkv"）
         
     Returns:
-        set[str]: 标准化的扩展名集合，全部小写且以"."开头（如 {'.mp4', '.mkv', '.avi'}）
+        frozenset[str]: 标准化的扩展名集合，全部小写且以"."开头（如 {'.mp4', '.mkv', '.avi'}）
     """
     if not exts:
-        return set()
+        return frozenset()
     
     result = set()
     for part in exts.split(','):
@@ -42,36 +44,52 @@ def _parse_video_extensions(exts: str) -> set[str]:
                 part = f'.{part}'
             result.add(part)
     
-    return result
+    return frozenset(result)
+
+
+def _file_extension(filename: str) -> str:
+    """取小写扩展名：直接对文件名做 rpartition，与 Path.suffix 语义一致但省去属性计算"""
+    stem, _, ext = filename.rpartition('.')
+    return f".{ext.lower()}" if stem and ext else ""
 
 
 def _validate_file(
     file_path: Path,
-    allowed_extensions: set[str],
+    allowed_extensions: frozenset[str],
     *,
-    min_size_bytes: int
+    min_size_bytes: int,
+    stat_result: os.stat_result | None = None
 ) -> tuple[bool, str]:
     """
     验证文件是否符合扩展名和大小要求。
     
     Args:
         file_path: 要验证的文件路径
-        allowed_extensions: 允许的扩展名集合（如 {'.mp4', '.mkv'}）
+        allowed_extensions: 允许的扩展名集合，须已小写且以"."开头（如 {'.mp4', '.mkv'}）
         min_size_bytes: 最小文件大小（字节），0表示不检查大小
+        stat_result: 调用方已获取的文件信息（如 DirEntry.stat()），为 None 时自行 stat
         
     Returns:
         tuple[bool, str]: (是否有效, 失败原因)
     """
     # 检查文件扩展名
-    file_extension = file_path.suffix.lower()
+    file_extension = _file_extension(file_path.name)
     if file_extension not in allowed_extensions:
         return False, f"扩展名 {file_extension} 不在允许列表中"
     
-    # 获取文件信息
-    try:
-        stat_info = file_path.stat()
-    except OSError:
-        return False, "无法获取文件信息"
+    # 获取文件信息（直接调用 os.stat，按错误类型给出原因）
+    if stat_result is not None:
+        stat_info = stat_result
+    else:
+        try:
+            stat_info = os.stat(file_path)
+        except FileNotFoundError:
+            return False, "文件不存在"
+        except OSError as e:
+            return False, f"无法获取文件信息: {e}"
+    
+    if not stat.S_ISREG(stat_info.st_mode):
+        return False, "不是普通文件"
     
     # 检查文件大小（仅当 min_size_bytes > 0 时）
     if min_size_bytes > 0 and stat_info.st_size < min_size_bytes:
@@ -80,9 +98,49 @@ def _validate_file(
     return True, ""
 
 
+def _validate_files_batch(
+    entries: Iterable[os.DirEntry],
+    allowed_extensions: frozenset[str],
+    *,
+    min_size_bytes: int
+) -> list[tuple[Path, bool, str, os.stat_result | None]]:
+    """
+    批量验证同一目录下的文件，结果顺序与输入一致。
+    
+    扩展名不符的文件不会触发 stat 调用；其余文件使用 DirEntry.stat() 的缓存结果，
+    并随结果一起返回，供后续入库复用。单个文件 stat 失败只影响该文件自身的结果。
+    
+    Args:
+        entries: os.scandir 得到的文件目录项
+        allowed_extensions: 允许的扩展名集合（如 {'.mp4', '.mkv'}）
+        min_size_bytes: 最小文件大小（字节），0表示不检查大小
+        
+    Returns:
+        list[tuple[Path, bool, str, os.stat_result | None]]: 每个文件的 (路径, 是否有效, 失败原因, 文件信息)
+    """
+    results = []
+    for entry in entries:
+        stat_result = None
+        if _file_extension(entry.name) in allowed_extensions:
+            # stat 失败时留给 _validate_file 重试并给出失败原因
+            with contextlib.suppress(OSError):
+                stat_result = entry.stat()
+        
+        file_path = Path(entry.path)
+        is_valid, reason = _validate_file(
+            file_path,
+            allowed_extensions,
+            min_size_bytes=min_size_bytes,
+            stat_result=stat_result
+        )
+        results.append((file_path, is_valid, reason, stat_result))
+    return results
+
+
 def _process_single_file(
     db_session: Session,
-    file_path: Path
+    file_path: Path,
+    stat_result: os.stat_result | None = None
 ) -> int | None:
     """
     处理单个文件，将其添加到数据库中（如果不存在）。
@@ -90,15 +148,20 @@ def _process_single_file(
     Args:
         db_session: 数据库会话
         file_path: 要处理的文件路径
+        stat_result: 调用方已获取的文件信息，为 None 时自行 stat
         
     Returns:
         int | None: 成功创建新记录时返回文件ID，其他情况返回None
     """
-    # 获取文件的统计信息
-    try:
-        stat_info = file_path.stat()
-    except OSError:
-        return None
+    # 获取文件的统计信息；Windows 上 DirEntry.stat() 不填充 st_ino / st_dev（均为 0），
+    # 而 inode + device 是去重依据，此时必须重新 stat 获取真实值
+    if stat_result is not None and stat_result.st_ino != 0:
+        stat_info = stat_result
+    else:
+        try:
+            stat_info = file_path.stat()
+        except OSError:
+            return None
     
     inode = stat_info.st_ino
     device_id = stat_info.st_dev
@@ -124,14 +187,70 @@ def _process_single_file(
 
 
 def _log_scan_error(e: OSError):
-    """os.walk的错误回调函数，仅记录错误并继续"""
+    """目录遍历的错误回调函数，仅记录错误并继续"""
     logger.warning(f"{SCANNER_LOG_PREFIX} 扫描时访问路径失败，已跳过: {e}")
 
 
+def _walk_file_entries(
+    root: Path,
+    *,
+    follow_symlinks: bool,
+    exclude_dir_abs: str | None
+) -> Iterator[tuple[str, list[os.DirEntry]]]:
+    """
+    基于 os.scandir 的自顶向下目录遍历，按目录产出非目录项。
+    
+    与 os.walk 行为一致（错误回调、是否跟随目录软链接），但直接产出 DirEntry，
+    使调用方可以复用其缓存的类型与 stat 信息。
+    
+    Args:
+        root: 遍历起点
+        follow_symlinks: 是否进入指向目录的软链接
+        exclude_dir_abs: 需要跳过的目录（绝对路径前缀），为 None 时不排除
+        
+    Yields:
+        tuple[str, list[os.DirEntry]]: (目录路径, 该目录下的非目录项)
+    """
+    pending = [os.fspath(root)]
+    while pending:
+        dirpath = pending.pop()
+        
+        # 跳过目标目录以提高效率
+        # 使用resolve()确保路径是绝对的，然后用字符串比较
+        if exclude_dir_abs is not None and str(Path(dirpath).resolve()).startswith(exclude_dir_abs):
+            logger.trace(f"{SCANNER_LOG_PREFIX} 跳过目标目录及其子目录: {dirpath}")
+            continue
+        
+        try:
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError as e:
+            _log_scan_error(e)
+            continue
+        
+        subdirs = []
+        files = []
+        for entry in entries:
+            # 与 os.walk 相同：指向目录的软链接算作目录，但仅在 follow_symlinks 时进入
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.append(entry)
+            elif follow_symlinks or not entry.is_symlink():
+                subdirs.append(entry)
+        
+        yield dirpath, files
+        
+        # 逆序入栈，保证按目录项顺序自顶向下遍历
+        pending.extend(entry.path for entry in reversed(subdirs))
+
+
 def scan_directory_once(
     db_session: Session, 
     settings: Settings, 
-    allowed_extensions: Set[str]
+    allowed_extensions: frozenset[str]
 ) -> List[int]:
     """
     扫描指定目录一次，发现新的媒体文件并添加到数据库。
@@ -158,44 +277,36 @@ def scan_directory_once(
     
     try:
         files_found = 0
-        walk_iterator = os.walk(
-            source_dir, 
-            onerror=_log_scan_error, 
-            followlinks=settings.SCAN_FOLLOW_SYMLINKS
+        walk_iterator = _walk_file_entries(
+            source_dir,
+            follow_symlinks=settings.SCAN_FOLLOW_SYMLINKS,
+            exclude_dir_abs=target_dir_abs if settings.SCAN_EXCLUDE_TARGET_DIR else None
         )
 
-        for dirpath, dirnames, filenames in walk_iterator:
-            # 跳过目标目录以提高效率
-            # 使用resolve()确保路径是绝对的，然后用字符串比较
-            if settings.SCAN_EXCLUDE_TARGET_DIR and str(Path(dirpath).resolve()).startswith(target_dir_abs):
-                logger.trace(f"{SCANNER_LOG_PREFIX} 跳过目标目录及其子目录: {dirpath}")
-                # 清空dirnames, 告诉os.walk不要再进入这个目录的子目录
-                dirnames[:] = []
-                continue
-
-            for filename in filenames:
-                files_found += 1
-                file_path = Path(dirpath) / filename
+        for _, file_entries in walk_iterator:
+            files_found += len(file_entries)
             
-                # 使用工具函数验证文件
-                is_valid, reason = _validate_file(
-                    file_path, 
-                    allowed_extensions, 
-                    min_size_bytes=min_file_size_bytes
-                )
-                
+            # 按目录批量验证文件
+            validated = _validate_files_batch(
+                file_entries,
+                allowed_extensions,
+                min_size_bytes=min_file_size_bytes
+            )
+            
+            for file_path, is_valid, reason, stat_result in validated:
                 if not is_valid:
-                    logger.trace(f"{SCANNER_LOG_PREFIX} 跳过文件 {file_path.name}: {reason}")
+                    # 逐文件的 trace 日志使用 loguru 延迟格式化，未启用 TRACE 时不构造消息字符串
+                    logger.trace("{} 跳过文件 {}: {}", SCANNER_LOG_PREFIX, file_path.name, reason)
                     continue
                 
                 # 使用工具函数处理文件
-                new_file_id = _process_single_file(db_session, file_path)
+                new_file_id = _process_single_file(db_session, file_path, stat_result)
                 
                 if new_file_id is not None:
                     new_file_ids.append(new_file_id)
                     logger.info(f"{SCANNER_LOG_PREFIX} 新增媒体文件: {file_path.name} (ID: {new_file_id})")
                 else:
-                    logger.trace(f"{SCANNER_LOG_PREFIX} 文件已存在于数据库或处理失败: {file_path.name}")
+                    logger.trace("{} 文件已存在于数据库或处理失败: {}", SCANNER_LOG_PREFIX, file_path.name)
         
         logger.debug(
             f"{SCANNER_LOG_PREFIX} 扫描完成 - 总文件: {files_found}, "
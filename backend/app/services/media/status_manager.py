@@ -3,8 +3,8 @@
 负责原子性地更新媒体文件的状态和相关字段
 """
 
-from typing import Callable
-from sqlmodel import Session
+from typing import Callable, Sequence
+from sqlmodel import Session, update
 from loguru import logger
 
 from ...core.models import MediaFile, FileStatus
@@ -63,6 +63,27 @@ def set_processing(
     )
 
 
+def set_processing_bulk(
+    db_session_factory: Callable[[], Session],
+    media_file_ids: Sequence[int]
+) -> None:
+    """批量设置为处理中状态（单条 UPDATE ... WHERE id IN (...)，原子提交）"""
+    if not media_file_ids:
+        return
+    
+    try:
+        with db_session_factory() as db:
+            db.exec(
+                update(MediaFile)
+                .where(MediaFile.id.in_(media_file_ids))
+                .values(status=FileStatus.PROCESSING, error_message=None)
+            )
+            db.commit()
+            
+    except Exception as e:
+        logger.error(f"Failed to set processing status for media files {list(media_file_ids)}: {e}")
+
+
 def set_queued(
     db_session_factory: Callable[[], Session],
     media_file_id: int
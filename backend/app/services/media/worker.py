@@ -0,0 +1,122 @@
+"""媒体文件 Worker 模块
+
+负责从队列中批量取出 Producer 放入的文件 ID，更新为 PROCESSING 状态后交给处理器处理。
+"""
+
+import asyncio
+import os
+from typing import Callable
+
+from loguru import logger
+from sqlmodel import Session
+
+from ...config import Settings
+from .batched_queue import get_many
+from .processor import process_media_file
+from .status_manager import set_processing_bulk
+
+__all__ = ["resolve_worker_count", "worker_loop"]
+
+# 每个 Worker 单次从队列取出的最大任务数，以及凑批的最长等待时间（秒）；
+# 批量只用于合并出队与 PROCESSING 状态更新，一批内的文件逐个处理，
+# 因此同时处理的文件数仍等于 WORKER_COUNT。取值较小，避免最先被唤醒的 Worker 取走全部就绪任务
+WORKER_BATCH_SIZE = 4
+WORKER_BATCH_WAIT_SECONDS = 0.05
+
+# WORKER_COUNT=0 时自动计算：每个 CPU 核心对应的 Worker 数、每个 Worker 预留的文件描述符数，
+# 以及自动计算结果的上限（与配置中 WORKER_COUNT 允许的最大值 le=10 保持一致）
+AUTO_WORKERS_PER_CPU = 4
+AUTO_FDS_PER_WORKER = 16
+AUTO_MAX_WORKERS = 10
+
+
+def resolve_worker_count(configured: int) -> int:
+    """确定实际启动的 Worker 数量
+    
+    configured 大于 0 时直接使用；为 0 时按 min(CPU 核心数 * 4, 文件描述符软限制 // 16) 自动计算，
+    结果限制在 [1, AUTO_MAX_WORKERS] 之间，与显式配置的取值范围一致。处理过程以 SQLite 与网络 IO 为主，Worker 数可以多于 CPU 核心数，
+    但每个 Worker 都会占用数据库连接和网络连接，因此同时受文件描述符上限约束。
+    
+    Args:
+        configured: 配置中的 WORKER_COUNT
+        
+    Returns:
+        int: 实际启动的 Worker 数量
+    """
+    if configured > 0:
+        return configured
+    
+    count = (os.cpu_count() or 1) * AUTO_WORKERS_PER_CPU
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块，只按 CPU 核心数计算
+        pass
+    else:
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft_limit != resource.RLIM_INFINITY:
+            count = min(count, soft_limit // AUTO_FDS_PER_WORKER)
+    return max(1, min(count, AUTO_MAX_WORKERS))
+
+
+async def worker_loop(
+    worker_id: int,
+    queue: asyncio.Queue[int],
+    db_session_factory: Callable[[], Session],
+    settings: Settings
+) -> None:
+    """工作者协程循环
+    
+    从队列中批量获取文件 ID（每批最多 WORKER_BATCH_SIZE 个），用一条 UPDATE 将状态更新为 PROCESSING，
+    然后逐个处理这批文件。每个 Worker 同一时刻只处理一个文件，LLM/TMDB 调用的并发数由 WORKER_COUNT 决定。
+    
+    Args:
+        worker_id: 工作者ID（用于日志标识）
+        queue: 包含文件ID的异步队列
+        db_session_factory: 数据库会话工厂
+        settings: 应用配置
+    """
+    # worker_id 通过 contextualize 进入每条日志的 extra（输出格式中的 {extra}），消息本身不再重复；
+    # 日志参数交给 loguru 延迟格式化，记录被级别过滤时不会构造消息字符串
+    with logger.contextualize(worker_id=worker_id):
+        logger.info("Worker 启动")
+        
+        while True:
+            try:
+                # 从队列中批量获取文件 ID
+                media_file_ids = await get_many(queue, WORKER_BATCH_SIZE, WORKER_BATCH_WAIT_SECONDS)
+                logger.info("获取到 {} 个任务: {}", len(media_file_ids), media_file_ids)
+                
+                try:
+                    # 将状态从 QUEUED 批量更新为 PROCESSING；同步的数据库写入放到线程中执行，不阻塞事件循环
+                    await asyncio.to_thread(set_processing_bulk, db_session_factory, media_file_ids)
+                    logger.info("已将 {} 个文件状态更新为 PROCESSING", len(media_file_ids))
+                    
+                    # 逐个处理这批媒体文件，单个文件的异常不影响其他文件；状态已批量更新，处理器不再逐个更新
+                    for media_file_id in media_file_ids:
+                        try:
+                            result = await process_media_file(
+                                media_file_id, db_session_factory, settings, mark_processing=False
+                            )
+                        except Exception as e:
+                            logger.error("处理文件 {} 时发生异常: {}", media_file_id, e)
+                            continue
+                        
+                        if result.success:
+                            logger.info("成功处理文件 {}", media_file_id)
+                        else:
+                            logger.warning("处理文件 {} 失败: {}", media_file_id, result.message)
+                        
+                except Exception as e:
+                    logger.error("处理文件 {} 时发生异常: {}", media_file_ids, e)
+                finally:
+                    # 标记本批任务全部完成
+                    for _ in media_file_ids:
+                        queue.task_done()
+                    
+            except asyncio.CancelledError:
+                logger.info("Worker 被取消")
+                break
+            except Exception as e:
+                logger.error("Worker 发生异常: {}", e)
+                await asyncio.sleep(1)  # 避免快速循环
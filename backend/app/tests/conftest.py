@@ -6,6 +6,117 @@ from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlmodel import Session, SQLModel, create_engine
+from xdist import is_xdist_worker
+
+from app.core import models  # noqa: F401  确保所有表已注册到 metadata
+
+
+def pytest_configure(config):
+    """xdist 并行时为每个 worker 分配独立的内存数据库
+
+    必须在任何测试模块导入 app.config 之前设置 DATABASE_URL，
+    这样各 worker 进程的全局 engine 互不干扰，避免争用同一个 SQLite 文件。
+    """
+    workerinput = getattr(config, "workerinput", None)
+    if workerinput is not None:
+        worker_id = workerinput["workerid"]
+        os.environ["DATABASE_URL"] = (
+            f"sqlite:///file:memdb_{worker_id}?mode=memory&cache=shared&uri=true"
+        )
+
+
+@pytest.fixture(scope="session", autouse=True)
+def xdist_worker_db(request):
+    """在 xdist worker 的内存数据库中建表（每个 worker 仅执行一次）"""
+    if not is_xdist_worker(request):
+        yield
+        return
+
+    from app.db import create_db_and_tables, engine
+
+    create_db_and_tables()
+    # 持有一个连接，保证共享缓存的内存数据库在整个测试会话内不被释放
+    with engine.connect():
+        yield
+
+
+# 模块加载时预编译建表 DDL，建库时直接执行 SQL，跳过 create_all 的元数据检查流程
+_SCHEMA_DDL = tuple(
+    str(ddl.compile(dialect=sqlite.dialect()))
+    for table in SQLModel.metadata.sorted_tables
+    for ddl in (CreateTable(table), *(CreateIndex(index) for index in table.indexes))
+)
+
+
+_TEST_SQLITE_PRAGMAS = (
+    "PRAGMA synchronous=OFF",
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA locking_mode=EXCLUSIVE",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+@pytest.fixture(scope="session")
+def in_memory_db():
+    """创建内存SQLite数据库用于测试（整个测试会话只建一次表）"""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        # pysqlite 默认的隐式事务会破坏 SAVEPOINT，改为由 SQLAlchemy 显式发出 BEGIN
+        dbapi_connection.isolation_level = None
+
+        # 测试库无需持久性保证，关闭同步并把日志/临时数据全部放在内存中
+        cursor = dbapi_connection.cursor()
+        for pragma in _TEST_SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    with engine.begin() as conn:
+        for ddl in _SCHEMA_DDL:
+            conn.exec_driver_sql(ddl)
+    return engine
+
+
+@pytest.fixture(scope="session")
+def db_connection(in_memory_db):
+    """整个测试会话共享的连接，外层事务始终不提交"""
+    with in_memory_db.connect() as conn:
+        with conn.begin():
+            yield conn
+
+
+@pytest.fixture
+def db_session_factory(db_connection):
+    """数据库会话工厂
+
+    每个测试运行在独立的 SAVEPOINT 中：会话内的 commit() 只释放内层保存点，
+    测试结束后回滚该 SAVEPOINT，无需重建表即可保证测试间相互隔离。
+    会话配置由 sessionmaker 预先绑定，提交后不过期已加载的属性。
+    """
+    nested = db_connection.begin_nested()
+
+    yield sessionmaker(
+        class_=Session,
+        bind=db_connection,
+        join_transaction_mode="create_savepoint",
+        expire_on_commit=False,
+    )
+    nested.rollback()
 
 
 @pytest.fixture
@@ -98,28 +209,36 @@ def env_vars():
             del os.environ[k] 
 
 
+def _wire_mock_tmdbsimple(mocks: dict) -> None:
+    """把 Search/Movies 的返回值接到对应的 mock 上，并复位 API_KEY"""
+    mocks["tmdb"].Search.return_value = mocks["search"]
+    mocks["tmdb"].Movies.return_value = mocks["movies"]
+    mocks["tmdb"].API_KEY = None
+
+
+@pytest.fixture(scope="session")
+def _mock_tmdbsimple_tree():
+    """会话级 mock 树：整个测试会话只构建一次，由 mock_tmdbsimple 在每个用例后复位"""
+    mocks = {
+        "tmdb": MagicMock(),
+        "search": MagicMock(),
+        "movies": MagicMock()
+    }
+    _wire_mock_tmdbsimple(mocks)
+    return mocks
+
+
 @pytest.fixture
-def mock_tmdbsimple():
-    """提供模拟的tmdbsimple库"""
-    # 创建一个模拟的Search类
-    mock_search = MagicMock()
-    
-    # 创建一个模拟的Movies类
-    mock_movies = MagicMock()
-    
-    # 创建一个模拟的tmdbsimple模块
-    mock_tmdb = MagicMock()
-    mock_tmdb.Search.return_value = mock_search
-    mock_tmdb.Movies.return_value = mock_movies
+def mock_tmdbsimple(_mock_tmdbsimple_tree):
+    """提供模拟的tmdbsimple库
     
-    # 设置API_KEY属性
-    mock_tmdb.API_KEY = None
-    
-    return {
-        "tmdb": mock_tmdb,
-        "search": mock_search,
-        "movies": mock_movies
-    }
+    复用会话级 mock 树；用例结束后清空调用记录与配置的返回值/副作用，再重新接好 mock 之间的关系。
+    只有请求该 fixture 的用例才会构建和复位 mock 树。
+    """
+    yield _mock_tmdbsimple_tree
+    for mock in _mock_tmdbsimple_tree.values():
+        mock.reset_mock(return_value=True, side_effect=True)
+    _wire_mock_tmdbsimple(_mock_tmdbsimple_tree)
 
 
 @pytest.fixture
@@ -190,4 +190,4 @@ class TestBackgroundScannerTask:
             call_args = mock_scan.call_args[0]
             assert call_args[0] == mock_session  # db_session
             assert call_args[1] == mock_settings  # settings
-            assert isinstance(call_args[2], set)  # allowed_extensions should be a set 
\ No newline at end of file
+            assert isinstance(call_args[2], frozenset)  # allowed_extensions should be a frozenset
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""
+batched_queue.py 单元测试
+
+测试批量取队列任务：凑满上限、只取已就绪任务、等待窗口内补齐
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.media.batched_queue import get_many
+
+
+def _filled_queue(n: int) -> asyncio.Queue[int]:
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for i in range(n):
+        queue.put_nowait(i)
+    return queue
+
+
+class TestGetMany:
+    """测试 get_many 函数"""
+
+    @pytest.mark.asyncio
+    async def test_get_many_caps_at_max_items(self):
+        """测试最多取出 max_items 个任务，剩余任务留在队列中"""
+        queue = _filled_queue(5)
+
+        items = await get_many(queue, 3, 0)
+
+        assert items == [0, 1, 2]
+        assert queue.qsize() == 2
+
+    @pytest.mark.asyncio
+    async def test_get_many_returns_ready_items_without_waiting(self):
+        """测试等待窗口为0时只取已就绪的任务"""
+        queue = _filled_queue(2)
+
+        items = await get_many(queue, 10, 0)
+
+        assert items == [0, 1]
+        assert queue.empty()
+
+    @pytest.mark.asyncio
+    async def test_get_many_collects_items_within_wait_window(self):
+        """测试在等待窗口内到达的任务会被并入同一批"""
+        queue = _filled_queue(1)
+        asyncio.get_running_loop().call_soon(queue.put_nowait, 1)
+
+        items = await get_many(queue, 10, 0.05)
+
+        assert items == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_get_many_ready_queue_skips_blocking_get(self, mocker):
+        """测试队列非空时不调用 await queue.get()"""
+        queue = _filled_queue(3)
+        mocker.patch.object(queue, "get", side_effect=AssertionError("不应调用 queue.get()"))
+
+        items = await get_many(queue, 10, 0)
+
+        assert items == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_get_many_waits_for_first_item_when_empty(self):
+        """测试队列为空时阻塞等待第一个任务"""
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        asyncio.get_running_loop().call_soon(queue.put_nowait, 7)
+
+        items = await get_many(queue, 10, 0)
+
+        assert items == [7]
@@ -2,9 +2,10 @@
 配置热重载和数据库优先级测试用例
 """
 
+import asyncio
 import json
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 from app.core.models import ConfigItem
 from app.config import get_settings, cleanup_deprecated_configs
@@ -70,22 +71,26 @@ class TestConfigDatabasePriority:
 class TestConfigHotReload:
     """测试配置热重载机制"""
     
-    @patch('app.config.tmdbsimple')
-    @patch('app.config.asyncio.Semaphore')
-    def test_on_settings_reloaded_updates_globals(self, mock_semaphore, mock_tmdbsimple, setup_test_db):
-        """测试配置重载钩子更新全局变量"""
-        # 模拟tmdb模块
-        mock_tmdb_module = MagicMock()
-        
-        with patch('app.core.tmdb', mock_tmdb_module):
-            # 创建测试配置
+    def test_on_settings_reloaded_updates_globals(self, setup_test_db):
+        """测试配置重载后的副作用处理更新全局变量"""
+        # 先导入 tmdb 模块再 patch 其属性，不依赖同一进程中先运行的测试是否已导入 app.core.tmdb；
+        # 导入必须在 patch Semaphore 之前，否则模块级 TMDB_SEMAPHORE 会被替换成 mock
+        from app.core import tmdb
+        import tmdbsimple
+        from main import _apply_settings_side_effects
+        
+        with patch.object(tmdb, "TMDB_SEMAPHORE"), \
+                patch.object(tmdbsimple, "API_KEY", None), \
+                patch("asyncio.Semaphore") as mock_semaphore:
             settings = get_settings(force_reload=True)
+            asyncio.run(_apply_settings_side_effects(settings))
             
             # 验证tmdbsimple.API_KEY被更新
-            assert hasattr(mock_tmdbsimple, 'API_KEY')
+            assert tmdbsimple.API_KEY == settings.TMDB_API_KEY
             
             # 验证TMDB_SEMAPHORE被重新创建
             mock_semaphore.assert_called_with(settings.TMDB_CONCURRENCY)
+            assert tmdb.TMDB_SEMAPHORE is mock_semaphore.return_value
     
     def test_force_reload_triggers_hook(self, setup_test_db):
         """测试force_reload参数触发钩子函数"""
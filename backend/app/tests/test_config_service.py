@@ -146,7 +146,7 @@ class TestConfigServiceValidation:
         
     def test_update_with_invalid_worker_count(self, in_memory_db: Session):
         """测试使用无效的WORKER_COUNT值应该抛出ValidationError"""
-        updates = {"WORKER_COUNT": 0}  # 应该 >= 1
+        updates = {"WORKER_COUNT": -1}  # 应该 >= 0（0 表示自动）
         
         with pytest.raises(ValidationError):
             ConfigService.update_configs(in_memory_db, updates)
@@ -173,7 +173,7 @@ class TestConfigServiceValidation:
         # 混合有效和无效的配置更新
         updates = {
             "LOG_LEVEL": "ERROR",           # 有效
-            "WORKER_COUNT": -1,             # 无效，应该 >= 1
+            "WORKER_COUNT": -1,             # 无效，应该 >= 0
             "OPENAI_MODEL": "gpt-4",        # 有效
         }
         
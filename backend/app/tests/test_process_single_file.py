@@ -1,5 +1,6 @@
 """测试单个文件处理功能"""
 
+import os
 import tempfile
 from pathlib import Path
 from unittest.mock import Mock, patch
@@ -111,4 +112,20 @@ class TestProcessSingleFile:
                     assert result == 789
                     
                     # 可以验证是否调用了相关的数据库方法
-                    # 注意：具体的事务实现可能在CRUD层处理 
\ No newline at end of file
+                    # 注意：具体的事务实现可能在CRUD层处理 
+    
+    def test_process_single_file_zero_inode_stat_restats(self):
+        """测试传入的文件信息缺少 inode（如 Windows 上的 DirEntry.stat()）时重新 stat 获取去重依据"""
+        with tempfile.NamedTemporaryFile(suffix=".mp4") as tmp_file:
+            file_path = Path(tmp_file.name)
+            real_stat = file_path.stat()
+            # 模拟 Windows DirEntry.stat()：st_ino 与 st_dev 均为 0
+            dir_entry_stat = os.stat_result((real_stat.st_mode, 0, 0) + tuple(real_stat)[3:])
+            mock_session = Mock(spec=Session)
+            
+            with patch('app.services.media.scanner.crud.get_media_file_by_inode_device',
+                       return_value=Mock(spec=MediaFile)) as mock_lookup:
+                result = _process_single_file(mock_session, file_path, dir_entry_stat)
+                
+                assert result is None
+                mock_lookup.assert_called_once_with(mock_session, real_stat.st_ino, real_stat.st_dev)
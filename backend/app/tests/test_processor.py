@@ -7,39 +7,63 @@ processor.py 综合测试
 
 import pytest
 from pathlib import Path
-from unittest.mock import AsyncMock, MagicMock
-from sqlmodel import Session, create_engine, SQLModel
-from sqlalchemy.pool import StaticPool
 
-from app.services.media import process_media_file
+from app.core import llm, tmdb
+from app.services.media import process_media_file, processor
 from app.core.models import MediaFile, FileStatus
 from app.core.linker import LinkResult
 from app.config import Settings
 
 
-@pytest.fixture
-def in_memory_db():
-    """创建内存SQLite数据库用于测试"""
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
-    return engine
+# ---------------------------------------------------------------------------
+# 各用例共享的 LLM / TMDB 模拟结果
+# ---------------------------------------------------------------------------
+MOCK_LLM_RESULT = {
+    "title": "Sample Movie",
+    "year": 2023,
+    "type": "movie"
+}
 
+MOCK_TMDB_RESULT = {
+    "tmdb_id": 12345,
+    "media_type": "movie",
+    "processed_data": {
+        "title": "Sample Movie",
+        "release_date": "2023-06-15",
+        "overview": "A sample movie for testing"
+    }
+}
 
-@pytest.fixture
-def db_session_factory(in_memory_db):
-    """数据库会话工厂"""
-    def _get_session():
-        return Session(in_memory_db)
-    return _get_session
+# TMDB 无匹配场景
+NO_MATCH_LLM_RESULT = {
+    "title": "Unknown Movie",
+    "year": 2023,
+    "type": "movie"
+}
 
+# 混合搜索场景：LLM 将电影误识别为TV剧，TMDB 纠正为正确的电影类型
+HYBRID_LLM_RESULT = {
+    "title": "Inception",
+    "year": 2010,
+    "type": "tv"  # 错误的类型识别
+}
 
-@pytest.fixture
+HYBRID_TMDB_RESULT = {
+    "tmdb_id": 27205,
+    "media_type": "movie",  # 混合搜索纠正后的正确类型
+    "processed_data": {
+        "id": 27205,
+        "title": "Inception",
+        "release_date": "2010-07-16",
+        "overview": "A thief who steals corporate secrets...",
+        "vote_average": 8.4
+    }
+}
+
+
+@pytest.fixture(scope="session")
 def test_settings():
-    """测试用配置"""
+    """测试用配置（只校验构建一次，用例间按需 model_copy 覆盖字段）"""
     return Settings(
         DATABASE_URL="sqlite:///:memory:",
         OPENAI_API_KEY="test-key",
@@ -67,270 +91,143 @@ def sample_media_file(db_session_factory):
         )
         session.add(media_file)
         session.commit()
-        session.refresh(media_file)
+        # id 已由 INSERT 回填，会话提交后也不过期属性，无需再 refresh 查询一次
+        assert media_file.id is not None
         return media_file
 
 
-@pytest.mark.asyncio
-async def test_process_media_file_success(
-    monkeypatch,
-    db_session_factory,
-    test_settings,
-    sample_media_file
-):
-    """测试成功处理分支：所有步骤都成功"""
-    
-    # 模拟 LLM 分析成功
-    mock_llm_result = {
-        "title": "Sample Movie",
-        "year": 2023,
-        "type": "movie"
-    }
-    mock_analyze_filename = AsyncMock(return_value=mock_llm_result)
-    monkeypatch.setattr("app.core.llm.analyze_filename", mock_analyze_filename)
-    
-    # 模拟 TMDB 搜索成功
-    mock_tmdb_result = {
-        "tmdb_id": 12345,
-        "media_type": "movie",
-        "processed_data": {
-            "title": "Sample Movie",
-            "release_date": "2023-06-15",
-            "overview": "A sample movie for testing"
-        }
-    }
-    mock_search_media = AsyncMock(return_value=mock_tmdb_result)
-    monkeypatch.setattr("app.core.tmdb.search_media", mock_search_media)
-    
-    # 模拟 Linker 成功
-    mock_create_hardlink = MagicMock(return_value=LinkResult.LINK_SUCCESS)
-    monkeypatch.setattr("app.services.media.processor.create_hardlink", mock_create_hardlink)
-    
-    # 执行处理
-    await process_media_file(sample_media_file.id, db_session_factory, test_settings)
-    
-    # 验证结果
-    with db_session_factory() as session:
-        updated_file = session.get(MediaFile, sample_media_file.id)
-        assert updated_file.status == FileStatus.COMPLETED
-        assert updated_file.error_message is None
-        assert updated_file.new_filepath is not None
-        assert updated_file.processed_data is not None
-        assert updated_file.processed_data["title"] == "Sample Movie"
-    
-    # 验证调用
-    mock_analyze_filename.assert_called_once()
-    mock_search_media.assert_called_once()
-    mock_create_hardlink.assert_called_once()
+def async_return(value):
+    """构造一个返回固定值的异步函数替身，value 为异常实例时改为抛出该异常
 
+    与 fake_create_hardlink 一样只记录调用次数，不经过 unittest.mock 的调用记录机制。
+    """
+    async def _fake(*args, **kwargs):
+        _fake.calls += 1
+        if isinstance(value, Exception):
+            raise value
+        return value
 
-@pytest.mark.asyncio
-async def test_process_media_file_llm_failure(
-    monkeypatch,
-    db_session_factory,
-    test_settings,
-    sample_media_file
-):
-    """测试LLM失败分支：LLM分析抛出异常"""
-    
-    # 模拟 LLM 分析失败
-    mock_analyze_filename = AsyncMock(side_effect=Exception("LLM API Error"))
-    monkeypatch.setattr("app.core.llm.analyze_filename", mock_analyze_filename)
-    
-    # 执行处理
-    await process_media_file(sample_media_file.id, db_session_factory, test_settings)
-    
-    # 验证结果
-    with db_session_factory() as session:
-        updated_file = session.get(MediaFile, sample_media_file.id)
-        assert updated_file.status == FileStatus.FAILED
-        assert "LLM API Error" in updated_file.error_message
-        assert updated_file.processed_data is None
-        assert updated_file.new_filepath is None
+    _fake.calls = 0
+    return _fake
 
 
-@pytest.mark.asyncio
-async def test_process_media_file_tmdb_failure(
-    monkeypatch,
-    db_session_factory,
-    test_settings,
-    sample_media_file
-):
-    """测试TMDB失败分支：TMDB搜索抛出异常"""
-    
-    # 模拟 LLM 分析成功
-    mock_llm_result = {
-        "title": "Sample Movie",
-        "year": 2023,
-        "type": "movie"
-    }
-    mock_analyze_filename = AsyncMock(return_value=mock_llm_result)
-    monkeypatch.setattr("app.core.llm.analyze_filename", mock_analyze_filename)
-    
-    # 模拟 TMDB 搜索失败
-    mock_search_media = AsyncMock(side_effect=Exception("TMDB API Error"))
-    monkeypatch.setattr("app.core.tmdb.search_media", mock_search_media)
-    
-    # 执行处理
-    await process_media_file(sample_media_file.id, db_session_factory, test_settings)
-    
-    # 验证结果
-    with db_session_factory() as session:
-        updated_file = session.get(MediaFile, sample_media_file.id)
-        assert updated_file.status == FileStatus.FAILED
-        assert "TMDB API Error" in updated_file.error_message
-        assert updated_file.processed_data is None
-        assert updated_file.new_filepath is None
+def fake_create_hardlink(result):
+    """构造一个返回固定结果的 create_hardlink 替身
 
+    只记录调用次数和最近一次的参数，比 MagicMock 轻量得多。
+    """
+    def _fake_link(*args, **kwargs):
+        _fake_link.calls += 1
+        _fake_link.last_args = args
+        return result
 
-@pytest.mark.asyncio
-async def test_process_media_file_linker_failure(
-    monkeypatch,
-    db_session_factory,
-    test_settings,
-    sample_media_file
-):
-    """测试Linker失败分支：硬链接创建失败"""
-    
-    # 模拟 LLM 分析成功
-    mock_llm_result = {
-        "title": "Sample Movie",
-        "year": 2023,
-        "type": "movie"
-    }
-    mock_analyze_filename = AsyncMock(return_value=mock_llm_result)
-    monkeypatch.setattr("app.core.llm.analyze_filename", mock_analyze_filename)
-    
-    # 模拟 TMDB 搜索成功
-    mock_tmdb_result = {
-        "tmdb_id": 12345,
-        "media_type": "movie",
-        "processed_data": {
-            "title": "Sample Movie",
-            "release_date": "2023-06-15",
-            "overview": "A sample movie for testing"
-        }
-    }
-    mock_search_media = AsyncMock(return_value=mock_tmdb_result)
-    monkeypatch.setattr("app.core.tmdb.search_media", mock_search_media)
-    
-    # 模拟 Linker 失败
-    mock_create_hardlink = MagicMock(return_value=LinkResult.LINK_FAILED_UNKNOWN)
-    monkeypatch.setattr("app.services.media.processor.create_hardlink", mock_create_hardlink)
-    
-    # 执行处理
-    await process_media_file(sample_media_file.id, db_session_factory, test_settings)
-    
-    # 验证结果
-    with db_session_factory() as session:
-        updated_file = session.get(MediaFile, sample_media_file.id)
-        assert updated_file.status == FileStatus.FAILED
-        assert "硬链接创建失败" in updated_file.error_message
-        # processed_data 应该包含数据，因为前面的步骤成功了
-        assert updated_file.processed_data is not None
-        assert updated_file.new_filepath is None
+    _fake_link.calls = 0
+    _fake_link.last_args = None
+    return _fake_link
 
 
 @pytest.mark.asyncio
-async def test_process_media_file_linker_conflict(
+@pytest.mark.parametrize(
+    "llm_effect, tmdb_effect, link_result, enable_tmdb, "
+    "expected_status, expected_error, expect_processed_data, expect_new_filepath",
+    [
+        # 成功分支：所有步骤都成功
+        pytest.param(
+            MOCK_LLM_RESULT, MOCK_TMDB_RESULT, LinkResult.LINK_SUCCESS, True,
+            FileStatus.COMPLETED, None, True, True,
+            id="success",
+        ),
+        # LLM失败分支：LLM分析抛出异常
+        pytest.param(
+            Exception("LLM API Error"), MOCK_TMDB_RESULT, LinkResult.LINK_SUCCESS, True,
+            FileStatus.FAILED, "LLM API Error", False, False,
+            id="llm_failure",
+        ),
+        # TMDB失败分支：TMDB搜索抛出异常
+        pytest.param(
+            MOCK_LLM_RESULT, Exception("TMDB API Error"), LinkResult.LINK_SUCCESS, True,
+            FileStatus.FAILED, "TMDB API Error", False, False,
+            id="tmdb_failure",
+        ),
+        # Linker失败分支：硬链接创建失败（前面的步骤成功，processed_data 应有数据）
+        pytest.param(
+            MOCK_LLM_RESULT, MOCK_TMDB_RESULT, LinkResult.LINK_FAILED_UNKNOWN, True,
+            FileStatus.FAILED, "硬链接创建失败", True, False,
+            id="linker_failure",
+        ),
+        # Linker冲突分支：硬链接返回conflict状态
+        pytest.param(
+            MOCK_LLM_RESULT, MOCK_TMDB_RESULT, LinkResult.LINK_FAILED_CONFLICT, True,
+            FileStatus.CONFLICT, "目标路径已存在", True, False,
+            id="linker_conflict",
+        ),
+        # TMDB禁用分支：ENABLE_TMDB=False时跳过TMDB调用，没有TMDB数据就不会进行链接操作
+        pytest.param(
+            MOCK_LLM_RESULT, MOCK_TMDB_RESULT, LinkResult.LINK_SUCCESS, False,
+            FileStatus.COMPLETED, None, False, False,
+            id="tmdb_disabled",
+        ),
+    ],
+)
+async def test_process_media_file(
     monkeypatch,
     db_session_factory,
     test_settings,
-    sample_media_file
+    sample_media_file,
+    llm_effect,
+    tmdb_effect,
+    link_result,
+    enable_tmdb,
+    expected_status,
+    expected_error,
+    expect_processed_data,
+    expect_new_filepath,
 ):
-    """测试Linker冲突分支：硬链接返回conflict状态"""
-    
-    # 模拟 LLM 分析成功
-    mock_llm_result = {
-        "title": "Sample Movie",
-        "year": 2023,
-        "type": "movie"
-    }
-    mock_analyze_filename = AsyncMock(return_value=mock_llm_result)
-    monkeypatch.setattr("app.core.llm.analyze_filename", mock_analyze_filename)
-    
-    # 模拟 TMDB 搜索成功
-    mock_tmdb_result = {
-        "tmdb_id": 12345,
-        "media_type": "movie",
-        "processed_data": {
-            "title": "Sample Movie",
-            "release_date": "2023-06-15",
-            "overview": "A sample movie for testing"
-        }
-    }
-    mock_search_media = AsyncMock(return_value=mock_tmdb_result)
-    monkeypatch.setattr("app.core.tmdb.search_media", mock_search_media)
-    
-    # 模拟 Linker 冲突
-    mock_create_hardlink = MagicMock(return_value=LinkResult.LINK_FAILED_CONFLICT)
-    monkeypatch.setattr("app.services.media.processor.create_hardlink", mock_create_hardlink)
-    
+    """测试 process_media_file 的主要分支场景"""
+
+    mock_analyze_filename = async_return(llm_effect)
+    mock_search_media = async_return(tmdb_effect)
+    mock_create_hardlink = fake_create_hardlink(link_result)
+    monkeypatch.setattr(llm, "analyze_filename", mock_analyze_filename)
+    monkeypatch.setattr(tmdb, "search_media", mock_search_media)
+    monkeypatch.setattr(processor, "create_hardlink", mock_create_hardlink)
+
+    settings = test_settings
+    if not enable_tmdb:
+        settings = test_settings.model_copy(update={"ENABLE_TMDB": False})
+
     # 执行处理
-    await process_media_file(sample_media_file.id, db_session_factory, test_settings)
-    
+    await process_media_file(sample_media_file.id, db_session_factory, settings)
+
     # 验证结果
     with db_session_factory() as session:
         updated_file = session.get(MediaFile, sample_media_file.id)
-        assert updated_file.status == FileStatus.CONFLICT
-        assert "目标路径已存在" in updated_file.error_message
-        assert updated_file.processed_data is not None
-        assert updated_file.new_filepath is None
+        assert updated_file.status == expected_status
+        if expected_error is None:
+            assert updated_file.error_message is None
+        else:
+            assert expected_error in updated_file.error_message
 
+        if expect_processed_data:
+            assert updated_file.processed_data is not None
+            assert updated_file.processed_data["title"] == "Sample Movie"
+        else:
+            assert updated_file.processed_data is None
 
-@pytest.mark.asyncio
-async def test_process_media_file_tmdb_disabled(
-    monkeypatch,
-    db_session_factory,
-    sample_media_file
-):
-    """测试TMDB禁用分支：ENABLE_TMDB=False时跳过TMDB调用"""
-    
-    # 设置TMDB禁用
-    test_settings_tmdb_disabled = Settings(
-        DATABASE_URL="sqlite:///:memory:",
-        OPENAI_API_KEY="test-key",
-        TMDB_API_KEY="test-key",
-        SOURCE_DIR=Path("/tmp/test-source"),
-        TARGET_DIR=Path("/tmp/test-target"),
-        ENABLE_LLM=True,
-        ENABLE_TMDB=False,  # 禁用TMDB
-        WORKER_COUNT=1
-    )
-    
-    # 模拟 LLM 分析成功
-    mock_llm_result = {
-        "title": "Sample Movie",
-        "year": 2023,
-        "type": "movie"
-    }
-    mock_analyze_filename = AsyncMock(return_value=mock_llm_result)
-    monkeypatch.setattr("app.core.llm.analyze_filename", mock_analyze_filename)
-    
-    # 模拟 TMDB 搜索（不应被调用）
-    mock_search_media = AsyncMock()
-    monkeypatch.setattr("app.core.tmdb.search_media", mock_search_media)
-    
-    # 模拟 Linker 成功（但不会被调用，因为没有TMDB数据）
-    mock_create_hardlink = MagicMock(return_value=LinkResult.LINK_SUCCESS)
-    monkeypatch.setattr("app.services.media.processor.create_hardlink", mock_create_hardlink)
-    
-    # 执行处理
-    await process_media_file(sample_media_file.id, db_session_factory, test_settings_tmdb_disabled)
-    
-    # 验证结果（TMDB禁用时，没有TMDB数据就不会进行链接操作）
-    with db_session_factory() as session:
-        updated_file = session.get(MediaFile, sample_media_file.id)
-        assert updated_file.status == FileStatus.COMPLETED
-        assert updated_file.error_message is None
-        assert updated_file.llm_guess is not None  # 应该有LLM结果
-        assert updated_file.processed_data is None  # 没有TMDB数据
-        assert updated_file.new_filepath is None    # 没有链接操作
-    
-    # 验证TMDB未被调用
-    mock_analyze_filename.assert_called_once()
-    mock_search_media.assert_not_called()
-    mock_create_hardlink.assert_not_called()  # 没有TMDB数据，不会调用链接
+        if expect_new_filepath:
+            assert updated_file.new_filepath is not None
+        else:
+            assert updated_file.new_filepath is None
+
+        if not isinstance(llm_effect, Exception):
+            assert updated_file.llm_guess is not None  # 应该有LLM结果
+
+    # 验证调用
+    assert mock_analyze_filename.calls == 1
+    # LLM 成功且启用TMDB时才会搜索TMDB
+    assert mock_search_media.calls == (1 if enable_tmdb and not isinstance(llm_effect, Exception) else 0)
+    # 只有拿到TMDB数据后才会调用链接
+    assert mock_create_hardlink.calls == (1 if expect_processed_data else 0)
 
 
 @pytest.mark.asyncio
@@ -343,21 +240,16 @@ async def test_process_media_file_tmdb_no_match(
     """测试TMDB无匹配分支：TMDB搜索返回None时应设置为NO_MATCH状态"""
     
     # 模拟 LLM 分析成功
-    mock_llm_result = {
-        "title": "Unknown Movie",
-        "year": 2023,
-        "type": "movie"
-    }
-    mock_analyze_filename = AsyncMock(return_value=mock_llm_result)
-    monkeypatch.setattr("app.core.llm.analyze_filename", mock_analyze_filename)
+    mock_analyze_filename = async_return(NO_MATCH_LLM_RESULT)
+    monkeypatch.setattr(llm, "analyze_filename", mock_analyze_filename)
     
     # 模拟 TMDB 搜索返回 None（无匹配）
-    mock_search_media = AsyncMock(return_value=None)
-    monkeypatch.setattr("app.core.tmdb.search_media", mock_search_media)
+    mock_search_media = async_return(None)
+    monkeypatch.setattr(tmdb, "search_media", mock_search_media)
     
     # 模拟 Linker（不应被调用，因为没有TMDB数据）
-    mock_create_hardlink = MagicMock(return_value=LinkResult.LINK_SUCCESS)
-    monkeypatch.setattr("app.services.media.processor.create_hardlink", mock_create_hardlink)
+    mock_create_hardlink = fake_create_hardlink(LinkResult.LINK_SUCCESS)
+    monkeypatch.setattr(processor, "create_hardlink", mock_create_hardlink)
     
     # 执行处理
     result = await process_media_file(sample_media_file.id, db_session_factory, test_settings)
@@ -376,9 +268,9 @@ async def test_process_media_file_tmdb_no_match(
         assert updated_file.new_filepath is None    # 没有链接操作
     
     # 验证调用
-    mock_analyze_filename.assert_called_once()
-    mock_search_media.assert_called_once()
-    mock_create_hardlink.assert_not_called()  # 没有TMDB数据，不会调用链接
+    assert mock_analyze_filename.calls == 1
+    assert mock_search_media.calls == 1
+    assert mock_create_hardlink.calls == 0  # 没有TMDB数据，不会调用链接
 
 
 @pytest.mark.asyncio
@@ -391,32 +283,16 @@ async def test_process_media_file_tmdb_hybrid_search_correct_type(
     """测试TMDB混合搜索功能在processor中的集成：使用正确的media_type生成路径"""
     
     # 模拟 LLM 分析成功但类型识别错误（将电影识别为TV剧）
-    mock_llm_result = {
-        "title": "Inception",
-        "year": 2010,
-        "type": "tv"  # 错误的类型识别
-    }
-    mock_analyze_filename = AsyncMock(return_value=mock_llm_result)
-    monkeypatch.setattr("app.core.llm.analyze_filename", mock_analyze_filename)
+    mock_analyze_filename = async_return(HYBRID_LLM_RESULT)
+    monkeypatch.setattr(llm, "analyze_filename", mock_analyze_filename)
     
     # 模拟 TMDB 混合搜索成功，返回正确的电影类型
-    mock_tmdb_result = {
-        "tmdb_id": 27205,
-        "media_type": "movie",  # 混合搜索纠正后的正确类型
-        "processed_data": {
-            "id": 27205,
-            "title": "Inception",
-            "release_date": "2010-07-16",
-            "overview": "A thief who steals corporate secrets...",
-            "vote_average": 8.4
-        }
-    }
-    mock_search_media = AsyncMock(return_value=mock_tmdb_result)
-    monkeypatch.setattr("app.core.tmdb.search_media", mock_search_media)
+    mock_search_media = async_return(HYBRID_TMDB_RESULT)
+    monkeypatch.setattr(tmdb, "search_media", mock_search_media)
     
     # 模拟 Linker 成功
-    mock_create_hardlink = MagicMock(return_value=LinkResult.LINK_SUCCESS)
-    monkeypatch.setattr("app.services.media.processor.create_hardlink", mock_create_hardlink)
+    mock_create_hardlink = fake_create_hardlink(LinkResult.LINK_SUCCESS)
+    monkeypatch.setattr(processor, "create_hardlink", mock_create_hardlink)
     
     # 执行处理
     result = await process_media_file(sample_media_file.id, db_session_factory, test_settings)
@@ -435,9 +311,8 @@ async def test_process_media_file_tmdb_hybrid_search_correct_type(
         assert updated_file.new_filepath is not None
     
     # 验证硬链接调用，检查生成的路径是否基于正确的media_type
-    mock_create_hardlink.assert_called_once()
-    call_args = mock_create_hardlink.call_args
-    target_path = call_args[0][1]  # 第二个参数是目标路径
+    assert mock_create_hardlink.calls == 1
+    target_path = mock_create_hardlink.last_args[1]  # 第二个参数是目标路径
     
     # 验证路径是按电影类型生成的（Movies目录），而不是TV Shows目录
     assert "Movies" in str(target_path)
@@ -445,5 +320,5 @@ async def test_process_media_file_tmdb_hybrid_search_correct_type(
     assert "Inception (2010)" in str(target_path)
     
     # 验证调用
-    mock_analyze_filename.assert_called_once()
-    mock_search_media.assert_called_once() 
\ No newline at end of file
+    assert mock_analyze_filename.calls == 1
+    assert mock_search_media.calls == 1 
\ No newline at end of file
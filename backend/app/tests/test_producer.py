@@ -5,41 +5,53 @@ producer.py 单元测试
 """
 
 import pytest
-import asyncio
-from sqlmodel import Session, create_engine, SQLModel, select
-from sqlalchemy.pool import StaticPool
+from collections import deque
+from sqlmodel import Session, select
+from sqlalchemy import func
 
 from app.core.models import MediaFile, FileStatus
 from app.services.media.producer import producer_single_run, _process_batch
 
 
-@pytest.fixture
-def in_memory_db():
-    """创建内存SQLite数据库用于测试"""
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
-    return engine
+class SyncQueue:
+    """基于 deque 的最小 FIFO 队列，替代测试中的 asyncio.Queue
 
+    producer 只依赖 `await queue.put(...)`，测试只需要 FIFO 语义和
+    `qsize()`/`empty()`/`get_nowait()`，无需 asyncio.Queue 的 future 唤醒机制。
+    """
+
+    def __init__(self):
+        self._d = deque()
+
+    def put_nowait(self, item):
+        self._d.append(item)
+
+    async def put(self, item):
+        self._d.append(item)
+
+    def get_nowait(self):
+        return self._d.popleft()
+
+    def qsize(self) -> int:
+        return len(self._d)
+
+    def empty(self) -> bool:
+        return not self._d
 
-@pytest.fixture
-def db_session_factory(in_memory_db):
-    """数据库会话工厂"""
-    def _get_session():
-        return Session(in_memory_db)
-    return _get_session
+
+def _count_by_status(session: Session, status: FileStatus) -> int:
+    """在 SQLite 中直接统计指定状态的文件数，避免加载完整 ORM 对象"""
+    return session.exec(
+        select(func.count()).select_from(MediaFile).where(MediaFile.status == status)
+    ).one()
 
 
 @pytest.fixture
 def sample_pending_files(db_session_factory):
     """创建多个 PENDING 状态的测试文件"""
     with db_session_factory() as session:
-        files = []
-        for i in range(5):
-            media_file = MediaFile(
+        files = [
+            MediaFile(
                 inode=100000 + i,
                 device_id=200000,
                 original_filepath=f"/test/movie{i+1}.mp4",
@@ -47,16 +59,13 @@ def sample_pending_files(db_session_factory):
                 file_size=1024 * 1024 * (10 + i),  # 不同大小
                 status=FileStatus.PENDING
             )
-            session.add(media_file)
-            files.append(media_file)
-        
+            for i in range(5)
+        ]
+        session.add_all(files)
         session.commit()
         
-        # 刷新以获取数据库分配的ID
-        for file in files:
-            session.refresh(file)
-        
-        return files
+        # 一次查询取回数据库分配的ID，代替逐个 refresh
+        return list(session.exec(select(MediaFile).order_by(MediaFile.id)))
 
 
 @pytest.fixture
@@ -67,23 +76,19 @@ def mixed_status_files(db_session_factory):
         statuses = [FileStatus.PENDING, FileStatus.QUEUED, FileStatus.PROCESSING, FileStatus.COMPLETED, FileStatus.FAILED]
         
         for i, status in enumerate(statuses):
-            media_file = MediaFile(
+            files.append(MediaFile(
                 inode=300000 + i,
                 device_id=400000,
                 original_filepath=f"/test/mixed{i+1}.mp4",
                 original_filename=f"mixed{i+1}.mp4",
                 file_size=1024 * 1024 * 10,
                 status=status
-            )
-            session.add(media_file)
-            files.append(media_file)
+            ))
         
+        session.add_all(files)
         session.commit()
         
-        for file in files:
-            session.refresh(file)
-        
-        return files
+        return list(session.exec(select(MediaFile).order_by(MediaFile.id)))
 
 
 class TestProducerSingleRun:
@@ -93,7 +98,7 @@ class TestProducerSingleRun:
     async def test_producer_single_run_basic(self, db_session_factory, sample_pending_files):
         """测试基础的单次运行功能"""
         # 创建队列
-        queue = asyncio.Queue()
+        queue = SyncQueue()
         
         # 运行 Producer
         processed_count = await producer_single_run(db_session_factory, queue, batch_size=3)
@@ -106,17 +111,14 @@ class TestProducerSingleRun:
         
         # 验证数据库状态变化
         with db_session_factory() as session:
-            pending_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.PENDING)).all()
-            queued_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.QUEUED)).all()
+            pending_count = _count_by_status(session, FileStatus.PENDING)
+            queued_count = _count_by_status(session, FileStatus.QUEUED)
             
-            assert len(pending_files) == 2  # 剩余 2 个 PENDING
-            assert len(queued_files) == 3   # 3 个变成 QUEUED
+            assert pending_count == 2  # 剩余 2 个 PENDING
+            assert queued_count == 3   # 3 个变成 QUEUED
         
         # 验证队列中的文件ID
-        queued_ids = []
-        while not queue.empty():
-            file_id = await queue.get()
-            queued_ids.append(file_id)
+        queued_ids = [queue.get_nowait() for _ in range(queue.qsize())]
         
         assert len(queued_ids) == 3
         
@@ -130,7 +132,7 @@ class TestProducerSingleRun:
     @pytest.mark.asyncio
     async def test_producer_single_run_large_batch(self, db_session_factory, sample_pending_files):
         """测试批量大小大于可用文件数的情况"""
-        queue = asyncio.Queue()
+        queue = SyncQueue()
         
         # 批量大小大于文件数
         processed_count = await producer_single_run(db_session_factory, queue, batch_size=10)
@@ -141,16 +143,16 @@ class TestProducerSingleRun:
         
         # 验证所有文件都变成 QUEUED
         with db_session_factory() as session:
-            pending_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.PENDING)).all()
-            queued_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.QUEUED)).all()
+            pending_count = _count_by_status(session, FileStatus.PENDING)
+            queued_count = _count_by_status(session, FileStatus.QUEUED)
             
-            assert len(pending_files) == 0
-            assert len(queued_files) == 5
+            assert pending_count == 0
+            assert queued_count == 5
     
     @pytest.mark.asyncio
     async def test_producer_single_run_no_pending_files(self, db_session_factory):
         """测试没有 PENDING 文件的情况"""
-        queue = asyncio.Queue()
+        queue = SyncQueue()
         
         # 没有文件的情况下运行
         processed_count = await producer_single_run(db_session_factory, queue, batch_size=5)
@@ -161,7 +163,7 @@ class TestProducerSingleRun:
     @pytest.mark.asyncio
     async def test_producer_single_run_mixed_status(self, db_session_factory, mixed_status_files):
         """测试混合状态文件，只处理 PENDING 状态的文件"""
-        queue = asyncio.Queue()
+        queue = SyncQueue()
         
         processed_count = await producer_single_run(db_session_factory, queue, batch_size=10)
         
@@ -171,16 +173,16 @@ class TestProducerSingleRun:
         
         # 验证状态分布
         with db_session_factory() as session:
-            pending_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.PENDING)).all()
-            queued_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.QUEUED)).all()
+            pending_count = _count_by_status(session, FileStatus.PENDING)
+            queued_count = _count_by_status(session, FileStatus.QUEUED)
             
-            assert len(pending_files) == 0  # 原来的 PENDING 文件被处理了
-            assert len(queued_files) == 2   # 原来的 1 个 QUEUED + 新处理的 1 个
+            assert pending_count == 0  # 原来的 PENDING 文件被处理了
+            assert queued_count == 2   # 原来的 1 个 QUEUED + 新处理的 1 个
     
     @pytest.mark.asyncio
     async def test_producer_single_run_multiple_calls(self, db_session_factory, sample_pending_files):
         """测试多次调用 Producer 的情况"""
-        queue = asyncio.Queue()
+        queue = SyncQueue()
         
         # 第一次调用
         processed_count_1 = await producer_single_run(db_session_factory, queue, batch_size=2)
@@ -202,11 +204,11 @@ class TestProducerSingleRun:
         assert queue.qsize() == 5  # 总共 5 个文件都被处理了
         
         with db_session_factory() as session:
-            pending_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.PENDING)).all()
-            queued_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.QUEUED)).all()
+            pending_count = _count_by_status(session, FileStatus.PENDING)
+            queued_count = _count_by_status(session, FileStatus.QUEUED)
             
-            assert len(pending_files) == 0
-            assert len(queued_files) == 5
+            assert pending_count == 0
+            assert queued_count == 5
 
 
 class TestProducerProcessBatch:
@@ -215,7 +217,7 @@ class TestProducerProcessBatch:
     @pytest.mark.asyncio
     async def test_process_batch_basic(self, db_session_factory, sample_pending_files):
         """测试基础批处理功能"""
-        queue = asyncio.Queue()
+        queue = SyncQueue()
         
         processed_count = await _process_batch(db_session_factory, queue, batch_size=3)
         
@@ -225,7 +227,7 @@ class TestProducerProcessBatch:
     @pytest.mark.asyncio
     async def test_process_batch_empty_database(self, db_session_factory):
         """测试空数据库的批处理"""
-        queue = asyncio.Queue()
+        queue = SyncQueue()
         
         processed_count = await _process_batch(db_session_factory, queue, batch_size=5)
         
@@ -239,7 +241,7 @@ class TestProducerEdgeCases:
     @pytest.mark.asyncio
     async def test_producer_with_zero_batch_size(self, db_session_factory, sample_pending_files):
         """测试批量大小为 0 的情况（边界条件）"""
-        queue = asyncio.Queue()
+        queue = SyncQueue()
         
         # 批量大小为 0 应该不处理任何文件
         processed_count = await producer_single_run(db_session_factory, queue, batch_size=0)
@@ -249,14 +251,14 @@ class TestProducerEdgeCases:
         
         # 验证所有文件仍然是 PENDING 状态
         with db_session_factory() as session:
-            pending_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.PENDING)).all()
-            assert len(pending_files) == 5
+            pending_count = _count_by_status(session, FileStatus.PENDING)
+            assert pending_count == 5
     
     @pytest.mark.asyncio
     async def test_producer_sequential_access(self, db_session_factory, sample_pending_files):
         """测试顺序访问的情况（避免并发复杂性）"""
-        queue1 = asyncio.Queue()
-        queue2 = asyncio.Queue()
+        queue1 = SyncQueue()
+        queue2 = SyncQueue()
         
         # 顺序运行两个 Producer
         processed_count_1 = await producer_single_run(db_session_factory, queue1, batch_size=3)
@@ -271,23 +273,16 @@ class TestProducerEdgeCases:
         assert queue2.qsize() == 2
         
         # 验证没有文件被重复处理
-        all_queued_ids = set()
-        
-        while not queue1.empty():
-            file_id = await queue1.get()
-            all_queued_ids.add(file_id)
-            
-        while not queue2.empty():
-            file_id = await queue2.get()
-            all_queued_ids.add(file_id)
+        all_queued_ids = {queue1.get_nowait() for _ in range(queue1.qsize())}
+        all_queued_ids |= {queue2.get_nowait() for _ in range(queue2.qsize())}
         
         # 应该有 5 个不同的文件ID
         assert len(all_queued_ids) == 5
         
         # 验证所有文件都是 QUEUED 状态
         with db_session_factory() as session:
-            pending_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.PENDING)).all()
-            queued_files = session.exec(select(MediaFile).where(MediaFile.status == FileStatus.QUEUED)).all()
+            pending_count = _count_by_status(session, FileStatus.PENDING)
+            queued_count = _count_by_status(session, FileStatus.QUEUED)
             
-            assert len(pending_files) == 0  # 没有 PENDING 文件
-            assert len(queued_files) == 5   # 5 个文件都变成 QUEUED 
\ No newline at end of file
+            assert pending_count == 0  # 没有 PENDING 文件
+            assert queued_count == 5   # 5 个文件都变成 QUEUED 
\ No newline at end of file
@@ -6,33 +6,62 @@
 from pathlib import Path
 from unittest.mock import MagicMock
 
+import pytest
+
+from .. import crud
 from ..config import settings
+from ..services.media import scan_directory_once
+
+# 扫描时允许的视频扩展名
+ALLOWED_EXTENSIONS = frozenset(('.mp4', '.mkv', '.avi', '.mov'))
+
+# 各测试场景的目录树（按子目录区分），模块内只构建一次
+# 扫描器只看目录项和扩展名，不读取内容，因此全部使用空文件
+SCENARIO_TREES = {
+    "new_file_source": ("test_movie.mp4",),
+    "existing_source": ("existing_movie.mp4",),
+    "non_video_source": ("readme.txt", "poster.jpg"),
+    "empty_source": (),
+    "mixed_source": ("movie.mp4", "subtitle.srt", "episode.mkv", "thumbnail.png"),
+}
+
+
+@pytest.fixture(scope="module")
+def scan_root(tmp_path_factory) -> Path:
+    """模块级临时目录：在真实文件系统上一次性构建所有场景的目录树
+
+    扫描器只读取文件系统，测试之间不会修改目录树，因此无需逐个测试重建。
+    """
+    root = tmp_path_factory.mktemp("scan")
+    for directory, names in SCENARIO_TREES.items():
+        (root / directory).mkdir()
+        for name in names:
+            (root / directory / name).touch()
+    return root
 
 
 class TestScanDirectoryOnce:
     """测试scan_directory_once函数的核心逻辑"""
     
-    def test_scan_directory_once_new_file_creates_record(self, fs, mocker):
+    def test_scan_directory_once_new_file_creates_record(self, scan_root, mocker):
         """
         测试场景：扫描到新文件时应创建数据库记录
         
         当get_media_file_by_inode_device返回None（文件不存在于数据库）时，
         应该调用create_media_file创建新记录。
         """
-        # 设置虚拟文件系统
-        source_dir = Path("/test/source")
-        fs.create_dir(source_dir)
+        # 使用预构建的目录
+        source_dir = scan_root / "new_file_source"
         test_video = source_dir / "test_movie.mp4"
-        fs.create_file(test_video, contents="fake video content")
         
         # 模拟settings
         mocker.patch.object(settings, 'SOURCE_DIR', source_dir)
-        mocker.patch.object(settings, 'TARGET_DIR', Path("/test/target"))
+        mocker.patch.object(settings, 'TARGET_DIR', scan_root / "target")
         mocker.patch.object(settings, 'MIN_FILE_SIZE_MB', 0)
 
         # 模拟CRUD函数
-        mock_get_media_file = mocker.patch('app.crud.get_media_file_by_inode_device')
-        mock_create_media_file = mocker.patch('app.crud.create_media_file')
+        mock_get_media_file = mocker.patch.object(crud, 'get_media_file_by_inode_device')
+        mock_create_media_file = mocker.patch.object(crud, 'create_media_file')
         
         # 模拟文件不存在于数据库（返回None）
         mock_get_media_file.return_value = None
@@ -40,40 +69,32 @@ class TestScanDirectoryOnce:
         # 模拟数据库会话
         mock_db_session = MagicMock()
         
-        # 定义允许的扩展名
-        allowed_extensions = {'.mp4', '.mkv', '.avi', '.mov'}
-        
-        # 导入并调用待测试函数
-        from ..services.media import scan_directory_once
-        
         # 执行扫描
-        scan_directory_once(mock_db_session, settings, allowed_extensions)
+        scan_directory_once(mock_db_session, settings, ALLOWED_EXTENSIONS)
         
         # 验证CRUD函数调用
         mock_get_media_file.assert_called_once()
         mock_create_media_file.assert_called_once_with(mock_db_session, test_video)
     
-    def test_scan_directory_once_existing_file_skips_creation(self, fs, mocker):
+    def test_scan_directory_once_existing_file_skips_creation(self, scan_root, mocker):
         """
         测试场景：文件已存在于数据库时应跳过创建
         
         当get_media_file_by_inode_device返回已存在的MediaFile对象时，
         不应该调用create_media_file。
         """
-        # 设置虚拟文件系统
-        source_dir = Path("/test/source")
-        fs.create_dir(source_dir)
+        # 使用预构建的目录
+        source_dir = scan_root / "existing_source"
         test_video = source_dir / "existing_movie.mp4"
-        fs.create_file(test_video, contents="fake video content")
         
         # 模拟settings
         mocker.patch.object(settings, 'SOURCE_DIR', source_dir)
-        mocker.patch.object(settings, 'TARGET_DIR', Path("/test/target"))
+        mocker.patch.object(settings, 'TARGET_DIR', scan_root / "target")
         mocker.patch.object(settings, 'MIN_FILE_SIZE_MB', 0)
 
         # 模拟CRUD函数
-        mock_get_media_file = mocker.patch('app.crud.get_media_file_by_inode_device')
-        mock_create_media_file = mocker.patch('app.crud.create_media_file')
+        mock_get_media_file = mocker.patch.object(crud, 'get_media_file_by_inode_device')
+        mock_create_media_file = mocker.patch.object(crud, 'create_media_file')
         
         # 模拟文件已存在于数据库（返回MediaFile对象）
         mock_existing_media_file = MagicMock()
@@ -84,126 +105,88 @@ class TestScanDirectoryOnce:
         # 模拟数据库会话
         mock_db_session = MagicMock()
         
-        # 定义允许的扩展名
-        allowed_extensions = {'.mp4', '.mkv', '.avi', '.mov'}
-        
-        # 导入并调用待测试函数
-        from ..services.media import scan_directory_once
-        
         # 执行扫描
-        scan_directory_once(mock_db_session, settings, allowed_extensions)
+        scan_directory_once(mock_db_session, settings, ALLOWED_EXTENSIONS)
         
         # 验证CRUD函数调用
         mock_get_media_file.assert_called_once()
         mock_create_media_file.assert_not_called()  # 不应该创建新记录
     
-    def test_scan_directory_once_ignores_non_video_files(self, fs, mocker):
+    def test_scan_directory_once_ignores_non_video_files(self, scan_root, mocker):
         """
         测试场景：非视频文件应被忽略
         
-        对于不在allowed_extensions中的文件，
+        对于不在ALLOWED_EXTENSIONS中的文件，
         不应该调用任何CRUD函数。
         """
-        # 设置虚拟文件系统
-        source_dir = Path("/test/source")
-        fs.create_dir(source_dir)
-        
-        # 创建非视频文件
-        text_file = source_dir / "readme.txt"
-        image_file = source_dir / "poster.jpg"
-        fs.create_file(text_file, contents="some text")
-        fs.create_file(image_file, contents="fake image")
+        # 使用预构建的目录（仅包含 readme.txt 与 poster.jpg）
+        source_dir = scan_root / "non_video_source"
         
         # 模拟settings
         mocker.patch.object(settings, 'SOURCE_DIR', source_dir)
-        mocker.patch.object(settings, 'TARGET_DIR', Path("/test/target"))
+        mocker.patch.object(settings, 'TARGET_DIR', scan_root / "target")
         mocker.patch.object(settings, 'MIN_FILE_SIZE_MB', 0)
 
         # 模拟CRUD函数
-        mock_get_media_file = mocker.patch('app.crud.get_media_file_by_inode_device')
-        mock_create_media_file = mocker.patch('app.crud.create_media_file')
+        mock_get_media_file = mocker.patch.object(crud, 'get_media_file_by_inode_device')
+        mock_create_media_file = mocker.patch.object(crud, 'create_media_file')
         
         # 模拟数据库会话
         mock_db_session = MagicMock()
         
-        # 定义允许的扩展名（不包含.txt和.jpg）
-        allowed_extensions = {'.mp4', '.mkv', '.avi', '.mov'}
-        
-        # 导入并调用待测试函数
-        from ..services.media import scan_directory_once
-        
         # 执行扫描
-        scan_directory_once(mock_db_session, settings, allowed_extensions)
+        scan_directory_once(mock_db_session, settings, ALLOWED_EXTENSIONS)
         
         # 验证CRUD函数都没有被调用
         mock_get_media_file.assert_not_called()
         mock_create_media_file.assert_not_called()
     
-    def test_scan_directory_once_handles_empty_directory(self, fs, mocker):
+    def test_scan_directory_once_handles_empty_directory(self, scan_root, mocker):
         """
         测试场景：空目录处理
         
         对于空目录，不应该调用任何CRUD函数。
         """
-        # 设置虚拟文件系统 - 空目录
-        source_dir = Path("/test/empty_source")
-        fs.create_dir(source_dir)
+        # 使用预构建的空目录
+        source_dir = scan_root / "empty_source"
         
         # 模拟settings
         mocker.patch.object(settings, 'SOURCE_DIR', source_dir)
-        mocker.patch.object(settings, 'TARGET_DIR', Path("/test/target"))
+        mocker.patch.object(settings, 'TARGET_DIR', scan_root / "target")
         mocker.patch.object(settings, 'MIN_FILE_SIZE_MB', 0)
 
         # 模拟CRUD函数
-        mock_get_media_file = mocker.patch('app.crud.get_media_file_by_inode_device')
-        mock_create_media_file = mocker.patch('app.crud.create_media_file')
+        mock_get_media_file = mocker.patch.object(crud, 'get_media_file_by_inode_device')
+        mock_create_media_file = mocker.patch.object(crud, 'create_media_file')
         
         # 模拟数据库会话
         mock_db_session = MagicMock()
         
-        # 定义允许的扩展名
-        allowed_extensions = {'.mp4', '.mkv', '.avi', '.mov'}
-        
-        # 导入并调用待测试函数
-        from ..services.media import scan_directory_once
-        
         # 执行扫描
-        scan_directory_once(mock_db_session, settings, allowed_extensions)
+        scan_directory_once(mock_db_session, settings, ALLOWED_EXTENSIONS)
         
         # 验证CRUD函数都没有被调用
         mock_get_media_file.assert_not_called()
         mock_create_media_file.assert_not_called()
     
-    def test_scan_directory_once_handles_mixed_files(self, fs, mocker):
+    def test_scan_directory_once_handles_mixed_files(self, scan_root, mocker):
         """
         测试场景：混合文件类型处理
         
         目录中同时包含视频文件和非视频文件时，
         只对视频文件调用CRUD函数。
         """
-        # 设置虚拟文件系统
-        source_dir = Path("/test/mixed_source")
-        fs.create_dir(source_dir)
-        
-        # 创建混合文件
-        video_file = source_dir / "movie.mp4"
-        text_file = source_dir / "subtitle.srt"
-        another_video = source_dir / "episode.mkv"
-        image_file = source_dir / "thumbnail.png"
-        
-        fs.create_file(video_file, contents="video content")
-        fs.create_file(text_file, contents="subtitle content")
-        fs.create_file(another_video, contents="another video")
-        fs.create_file(image_file, contents="image content")
+        # 使用预构建的混合文件目录（2个视频文件 + 2个非视频文件）
+        source_dir = scan_root / "mixed_source"
         
         # 模拟settings
         mocker.patch.object(settings, 'SOURCE_DIR', source_dir)
-        mocker.patch.object(settings, 'TARGET_DIR', Path("/test/target"))
+        mocker.patch.object(settings, 'TARGET_DIR', scan_root / "target")
         mocker.patch.object(settings, 'MIN_FILE_SIZE_MB', 0)
 
         # 模拟CRUD函数
-        mock_get_media_file = mocker.patch('app.crud.get_media_file_by_inode_device')
-        mock_create_media_file = mocker.patch('app.crud.create_media_file')
+        mock_get_media_file = mocker.patch.object(crud, 'get_media_file_by_inode_device')
+        mock_create_media_file = mocker.patch.object(crud, 'create_media_file')
         
         # 模拟文件都不存在于数据库
         mock_get_media_file.return_value = None
@@ -211,14 +194,8 @@ class TestScanDirectoryOnce:
         # 模拟数据库会话
         mock_db_session = MagicMock()
         
-        # 定义允许的扩展名
-        allowed_extensions = {'.mp4', '.mkv', '.avi', '.mov'}
-        
-        # 导入并调用待测试函数
-        from ..services.media import scan_directory_once
-        
         # 执行扫描
-        scan_directory_once(mock_db_session, settings, allowed_extensions)
+        scan_directory_once(mock_db_session, settings, ALLOWED_EXTENSIONS)
         
         # 验证CRUD函数调用次数
         # 应该为2个视频文件各调用一次get_media_file_by_inode_device
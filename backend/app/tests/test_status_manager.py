@@ -2,16 +2,19 @@
 status_manager.py 单元测试
 
 测试状态管理的各种场景：设置处理中、完成、失败、冲突、无匹配等状态
+
+数据库 fixture（in_memory_db / db_session_factory）来自 conftest.py：
+整个测试会话共享一个内存库，每个测试在独立的 SAVEPOINT 中运行并在结束后回滚。
 """
 
 import pytest
-from sqlmodel import Session, create_engine, SQLModel
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import insert
 
 from app.core.models import MediaFile, FileStatus
 from app.services.media.status_manager import (
     update_status,
     set_processing,
+    set_processing_bulk,
     set_queued,
     set_completed,
     set_failed,
@@ -20,77 +23,101 @@ from app.services.media.status_manager import (
 )
 
 
-@pytest.fixture
-def in_memory_db():
-    """创建内存SQLite数据库用于测试"""
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
-    return engine
+def assert_status(db_session_factory, media_file_id: int, **expected) -> None:
+    """在一个会话内取出媒体文件一次，并逐项断言字段取值"""
+    with db_session_factory() as session:
+        media_file = session.get(MediaFile, media_file_id)
+        assert media_file is not None
+        for field, value in expected.items():
+            actual = getattr(media_file, field)
+            assert actual == value, f"{field}: {actual!r} != {value!r}"
 
 
 @pytest.fixture
-def db_session_factory(in_memory_db):
-    """数据库会话工厂"""
-    def _get_session():
-        return Session(in_memory_db)
-    return _get_session
-
+def sample_media_file_id(db_session_factory) -> int:
+    """创建示例媒体文件记录，返回其主键
 
-@pytest.fixture
-def sample_media_file(db_session_factory):
-    """创建示例媒体文件记录"""
+    测试只需要主键，直接用 Core insert().returning() 写入，跳过 ORM 实例化与工作单元。
+    """
     with db_session_factory() as session:
-        media_file = MediaFile(
-            inode=123456,
-            device_id=654321,
-            original_filepath="/tmp/test-source/Sample Movie (2023).mkv",
-            original_filename="Sample Movie (2023).mkv",
-            file_size=1024 * 1024 * 100,  # 100MB
-            status=FileStatus.PENDING
-        )
-        session.add(media_file)
+        media_file_id = session.execute(
+            insert(MediaFile).returning(MediaFile.id),
+            [{
+                "inode": 123456,
+                "device_id": 654321,
+                "original_filepath": "/tmp/test-source/Sample Movie (2023).mkv",
+                "original_filename": "Sample Movie (2023).mkv",
+                "file_size": 1024 * 1024 * 100,  # 100MB
+                "status": FileStatus.PENDING,
+            }],
+        ).scalar_one()
         session.commit()
-        session.refresh(media_file)
-        return media_file
+        return media_file_id
+
+
+@pytest.fixture
+def sample_media_files(db_session_factory):
+    """批量创建媒体文件记录的工厂
+
+    使用 bulk_save_objects(return_defaults=True) 一次写入多行并回填主键，
+    避免逐行 add/commit/refresh。
+    """
+    def _create(n: int) -> list[MediaFile]:
+        files = [
+            MediaFile(
+                inode=200000 + i,
+                device_id=654321,
+                original_filepath=f"/tmp/test-source/Batch Movie {i}.mkv",
+                original_filename=f"Batch Movie {i}.mkv",
+                file_size=1024 * 1024 * 100,
+                status=FileStatus.PENDING
+            )
+            for i in range(n)
+        ]
+        with db_session_factory() as session:
+            session.bulk_save_objects(files, return_defaults=True)
+            session.commit()
+        return files
+    return _create
 
 
 class TestUpdateStatus:
     """测试基础状态更新函数"""
     
-    def test_update_status_basic(self, db_session_factory, sample_media_file):
+    def test_update_status_basic(self, db_session_factory, sample_media_file_id):
         """测试基础状态更新"""
         update_status(
             db_session_factory,
-            sample_media_file.id,
+            sample_media_file_id,
             status=FileStatus.PROCESSING,
             error_message=None
         )
         
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.PROCESSING
-            assert updated_file.error_message is None
+        assert_status(
+            db_session_factory,
+            sample_media_file_id,
+            status=FileStatus.PROCESSING,
+            error_message=None
+        )
     
-    def test_update_status_with_error(self, db_session_factory, sample_media_file):
+    def test_update_status_with_error(self, db_session_factory, sample_media_file_id):
         """测试带错误消息的状态更新"""
         error_msg = "Test error message"
         update_status(
             db_session_factory,
-            sample_media_file.id,
+            sample_media_file_id,
             status=FileStatus.FAILED,
             error_message=error_msg
         )
         
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.FAILED
-            assert updated_file.error_message == error_msg
+        assert_status(
+            db_session_factory,
+            sample_media_file_id,
+            status=FileStatus.FAILED,
+            error_message=error_msg
+        )
     
-    def test_update_status_with_extra_fields(self, db_session_factory, sample_media_file):
+    def test_update_status_with_extra_fields(self, db_session_factory, sample_media_file_id):
         """测试带额外字段的状态更新"""
         extra_fields = {
             "tmdb_id": 12345,
@@ -100,18 +127,36 @@ class TestUpdateStatus:
         
         update_status(
             db_session_factory,
-            sample_media_file.id,
+            sample_media_file_id,
             status=FileStatus.COMPLETED,
             error_message=None,
             extra_fields=extra_fields
         )
         
+        assert_status(
+            db_session_factory,
+            sample_media_file_id,
+            status=FileStatus.COMPLETED,
+            tmdb_id=12345,
+            media_type="movie",
+            new_filepath="/target/Movie (2023).mkv"
+        )
+    
+    def test_update_status_only_affects_target(self, db_session_factory, sample_media_files):
+        """测试状态更新只影响目标文件"""
+        target, *others = sample_media_files(3)
+        
+        update_status(
+            db_session_factory,
+            target.id,
+            status=FileStatus.PROCESSING,
+            error_message=None
+        )
+        
         with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.COMPLETED
-            assert updated_file.tmdb_id == 12345
-            assert updated_file.media_type == "movie"
-            assert updated_file.new_filepath == "/target/Movie (2023).mkv"
+            assert session.get(MediaFile, target.id).status == FileStatus.PROCESSING
+            for other in others:
+                assert session.get(MediaFile, other.id).status == FileStatus.PENDING
     
     def test_update_status_nonexistent_file(self, db_session_factory):
         """测试更新不存在的文件状态"""
@@ -124,49 +169,64 @@ class TestUpdateStatus:
         )
 
 
-class TestSetProcessing:
-    """测试设置处理中状态"""
+CONFLICT_PATH = "/target/Movie (2023).mkv"
+
+
+class TestSetStatusVariants:
+    """测试各 set_* 便捷函数在最小参数下的状态与错误消息"""
     
-    def test_set_processing(self, db_session_factory, sample_media_file):
-        """测试设置为处理中状态"""
-        set_processing(db_session_factory, sample_media_file.id)
+    @pytest.mark.parametrize(
+        "fn,args,expected_status,expected_err",
+        [
+            (set_processing, (), FileStatus.PROCESSING, None),
+            (set_queued, (), FileStatus.QUEUED, None),
+            (set_completed, (), FileStatus.COMPLETED, None),
+            (set_failed, ("Processing failed",), FileStatus.FAILED, "Processing failed"),
+            (set_no_match, (), FileStatus.NO_MATCH, "No TMDB match found"),
+            (set_conflict, (CONFLICT_PATH,), FileStatus.CONFLICT, f"目标路径已存在: {CONFLICT_PATH}"),
+        ],
+        ids=["processing", "queued", "completed", "failed", "no_match", "conflict"],
+    )
+    def test_set_status_variants(
+        self, db_session_factory, sample_media_file_id, fn, args, expected_status, expected_err
+    ):
+        """测试设置状态后 status 与 error_message 符合预期"""
+        fn(db_session_factory, sample_media_file_id, *args)
         
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.PROCESSING
-            assert updated_file.error_message is None
+        assert_status(
+            db_session_factory,
+            sample_media_file_id,
+            status=expected_status,
+            error_message=expected_err
+        )
 
 
-class TestSetQueued:
-    """测试设置队列中状态"""
+class TestSetProcessingBulk:
+    """测试批量设置处理中状态"""
     
-    def test_set_queued(self, db_session_factory, sample_media_file):
-        """测试设置为队列中状态"""
-        set_queued(db_session_factory, sample_media_file.id)
+    def test_set_processing_bulk(self, db_session_factory, sample_media_files):
+        """测试一次更新多条记录，未列出的记录不受影响"""
+        *targets, other = sample_media_files(3)
         
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.QUEUED
-            assert updated_file.error_message is None
+        set_processing_bulk(db_session_factory, [f.id for f in targets])
+        
+        for target in targets:
+            assert_status(db_session_factory, target.id, status=FileStatus.PROCESSING, error_message=None)
+        assert_status(db_session_factory, other.id, status=FileStatus.PENDING)
+    
+    def test_set_processing_bulk_empty(self, db_session_factory):
+        """测试空列表时直接返回"""
+        set_processing_bulk(db_session_factory, [])
 
 
 class TestSetCompleted:
     """测试设置完成状态"""
     
-    def test_set_completed_minimal(self, db_session_factory, sample_media_file):
-        """测试最小参数的完成状态设置"""
-        set_completed(db_session_factory, sample_media_file.id)
-        
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.COMPLETED
-            assert updated_file.error_message is None
-    
-    def test_set_completed_full(self, db_session_factory, sample_media_file):
+    def test_set_completed_full(self, db_session_factory, sample_media_file_id):
         """测试完整参数的完成状态设置"""
         set_completed(
             db_session_factory,
-            sample_media_file.id,
+            sample_media_file_id,
             new_filepath="/target/Movie (2023).mkv",
             llm_guess={"title": "Movie", "year": 2023},
             tmdb_id=12345,
@@ -174,95 +234,72 @@ class TestSetCompleted:
             processed_data={"title": "Movie", "release_date": "2023-01-01"}
         )
         
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.COMPLETED
-            assert updated_file.new_filepath == "/target/Movie (2023).mkv"
-            assert updated_file.llm_guess == {"title": "Movie", "year": 2023}
-            assert updated_file.tmdb_id == 12345
-            assert updated_file.media_type == "movie"
-            assert updated_file.processed_data == {"title": "Movie", "release_date": "2023-01-01"}
+        assert_status(
+            db_session_factory,
+            sample_media_file_id,
+            status=FileStatus.COMPLETED,
+            new_filepath="/target/Movie (2023).mkv",
+            llm_guess={"title": "Movie", "year": 2023},
+            tmdb_id=12345,
+            media_type="movie",
+            processed_data={"title": "Movie", "release_date": "2023-01-01"}
+        )
 
 
 class TestSetFailed:
     """测试设置失败状态"""
     
-    def test_set_failed_basic(self, db_session_factory, sample_media_file):
-        """测试基础失败状态设置"""
-        error_msg = "Processing failed"
-        set_failed(db_session_factory, sample_media_file.id, error_msg)
-        
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.FAILED
-            assert updated_file.error_message == error_msg
-    
-    def test_set_failed_with_partial_data(self, db_session_factory, sample_media_file):
+    def test_set_failed_with_partial_data(self, db_session_factory, sample_media_file_id):
         """测试带部分数据的失败状态设置"""
         error_msg = "TMDB search failed"
         set_failed(
             db_session_factory,
-            sample_media_file.id,
+            sample_media_file_id,
             error_msg,
             llm_guess={"title": "Movie", "year": 2023},
             tmdb_id=12345
         )
         
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.FAILED
-            assert updated_file.error_message == error_msg
-            assert updated_file.llm_guess == {"title": "Movie", "year": 2023}
-            assert updated_file.tmdb_id == 12345
+        assert_status(
+            db_session_factory,
+            sample_media_file_id,
+            status=FileStatus.FAILED,
+            error_message=error_msg,
+            llm_guess={"title": "Movie", "year": 2023},
+            tmdb_id=12345
+        )
 
 
 class TestSetNoMatch:
     """测试设置无匹配状态"""
     
-    def test_set_no_match(self, db_session_factory, sample_media_file):
-        """测试设置无匹配状态"""
-        set_no_match(db_session_factory, sample_media_file.id)
-        
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.NO_MATCH
-            assert updated_file.error_message == "No TMDB match found"
-    
-    def test_set_no_match_with_llm_data(self, db_session_factory, sample_media_file):
+    def test_set_no_match_with_llm_data(self, db_session_factory, sample_media_file_id):
         """测试带LLM数据的无匹配状态设置"""
         llm_guess = {"title": "Unknown Movie", "year": 2023}
         set_no_match(
             db_session_factory,
-            sample_media_file.id,
+            sample_media_file_id,
             llm_guess=llm_guess
         )
         
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.NO_MATCH
-            assert updated_file.error_message == "No TMDB match found"
-            assert updated_file.llm_guess == llm_guess
+        assert_status(
+            db_session_factory,
+            sample_media_file_id,
+            status=FileStatus.NO_MATCH,
+            error_message="No TMDB match found",
+            llm_guess=llm_guess
+        )
 
 
 class TestSetConflict:
     """测试设置冲突状态"""
     
-    def test_set_conflict_basic(self, db_session_factory, sample_media_file):
-        """测试基础冲突状态设置"""
-        conflict_path = "/target/Movie (2023).mkv"
-        set_conflict(db_session_factory, sample_media_file.id, conflict_path)
-        
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.CONFLICT
-            assert f"目标路径已存在: {conflict_path}" in updated_file.error_message
-    
-    def test_set_conflict_with_full_data(self, db_session_factory, sample_media_file):
+    def test_set_conflict_with_full_data(self, db_session_factory, sample_media_file_id):
         """测试带完整数据的冲突状态设置"""
         conflict_path = "/target/Movie (2023).mkv"
         set_conflict(
             db_session_factory,
-            sample_media_file.id,
+            sample_media_file_id,
             conflict_path,
             llm_guess={"title": "Movie", "year": 2023},
             tmdb_id=12345,
@@ -270,11 +307,13 @@ class TestSetConflict:
             processed_data={"title": "Movie", "release_date": "2023-01-01"}
         )
         
-        with db_session_factory() as session:
-            updated_file = session.get(MediaFile, sample_media_file.id)
-            assert updated_file.status == FileStatus.CONFLICT
-            assert f"目标路径已存在: {conflict_path}" in updated_file.error_message
-            assert updated_file.llm_guess == {"title": "Movie", "year": 2023}
-            assert updated_file.tmdb_id == 12345
-            assert updated_file.media_type == "movie"
-            assert updated_file.processed_data == {"title": "Movie", "release_date": "2023-01-01"} 
\ No newline at end of file
+        assert_status(
+            db_session_factory,
+            sample_media_file_id,
+            status=FileStatus.CONFLICT,
+            error_message=f"目标路径已存在: {conflict_path}",
+            llm_guess={"title": "Movie", "year": 2023},
+            tmdb_id=12345,
+            media_type="movie",
+            processed_data={"title": "Movie", "release_date": "2023-01-01"}
+        )
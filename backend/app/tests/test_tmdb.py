@@ -1,13 +1,30 @@
 import pytest
 import asyncio
-import requests
 
-# 导入测试目标模块（假设路径为app.core.tmdb）
-# 注意：实际测试时，这个模块可能还不存在，但我们可以先写测试
+from requests.exceptions import HTTPError, Timeout
+
+# tmdbsimple/tenacity 是运行时必需依赖，导入失败应直接报错，而不是跳过整个模块
 from app.core import tmdb
 
+# 重试用例使用的异常实例，模块加载时构建一次
+_TIMEOUT = Timeout("Connection timed out")
+_HTTP_ERROR = HTTPError("500 Server Error")
+
+# 本模块的用例都只依赖 mock，彼此独立：共享一个会话级事件循环，避免逐个测试创建新循环
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+async def _passthrough_to_thread(func, *args, **kwargs):
+    """asyncio.to_thread 的替身：在当前协程内直接调用，异常可被 tenacity 捕获"""
+    return func(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def passthrough_to_thread(mocker):
+    """统一模拟 asyncio.to_thread，避免每个测试重复定义"""
+    mocker.patch.object(tmdb.asyncio, "to_thread", side_effect=_passthrough_to_thread)
+
 
-@pytest.mark.asyncio
 async def test_search_movie_success(mocker, mock_tmdbsimple):
     """
     测试用例 4.1: 成功找到匹配项
@@ -31,14 +48,7 @@ async def test_search_movie_success(mocker, mock_tmdbsimple):
     }]
     
     # 模拟tmdbsimple库
-    mocker.patch("app.core.tmdb.tmdbsimple", mock_tmdbsimple["tmdb"])
-    
-    # 模拟asyncio.to_thread
-    async def async_to_thread_mock(func, *args, **kwargs):
-        await asyncio.sleep(0)
-        return func(*args, **kwargs)
-
-    mocker.patch("app.core.tmdb.asyncio.to_thread", side_effect=async_to_thread_mock)
+    mocker.patch.object(tmdb, "tmdbsimple", mock_tmdbsimple["tmdb"])
     
     # 调用被测函数
     result = await tmdb.search_movie(llm_data)
@@ -53,7 +63,6 @@ async def test_search_movie_success(mocker, mock_tmdbsimple):
     mock_search.movie.assert_called_once_with(query="Dune Part Two", year=2024)
 
 
-@pytest.mark.asyncio
 async def test_search_movie_not_found(mocker, mock_tmdbsimple):
     """
     测试用例 4.2: 未找到匹配项
@@ -70,14 +79,7 @@ async def test_search_movie_not_found(mocker, mock_tmdbsimple):
     mock_search.results = []  # 空结果列表
     
     # 模拟tmdbsimple库
-    mocker.patch("app.core.tmdb.tmdbsimple", mock_tmdbsimple["tmdb"])
-    
-    # 模拟asyncio.to_thread
-    async def async_to_thread_mock(func, *args, **kwargs):
-        await asyncio.sleep(0)
-        return func(*args, **kwargs)
-
-    mocker.patch("app.core.tmdb.asyncio.to_thread", side_effect=async_to_thread_mock)
+    mocker.patch.object(tmdb, "tmdbsimple", mock_tmdbsimple["tmdb"])
     
     # 调用被测函数
     result = await tmdb.search_movie(llm_data)
@@ -89,7 +91,6 @@ async def test_search_movie_not_found(mocker, mock_tmdbsimple):
     mock_search.movie.assert_called_once_with(query="一部不存在的电影", year=1900)
 
 
-@pytest.mark.asyncio
 async def test_search_movie_async_wrapping(mocker, mock_tmdbsimple):
     """
     测试用例 4.3: 验证异步包装
@@ -110,7 +111,7 @@ async def test_search_movie_async_wrapping(mocker, mock_tmdbsimple):
     }]
     
     # 模拟tmdbsimple库
-    mocker.patch("app.core.tmdb.tmdbsimple", mock_tmdbsimple["tmdb"])
+    mocker.patch.object(tmdb, "tmdbsimple", mock_tmdbsimple["tmdb"])
     
     # 直接跟踪asyncio.to_thread的调用
     to_thread_spy = mocker.spy(asyncio, "to_thread")
@@ -126,7 +127,6 @@ async def test_search_movie_async_wrapping(mocker, mock_tmdbsimple):
     assert result["id"] == 12345
 
 
-@pytest.mark.asyncio
 async def test_get_movie_details(mocker, mock_tmdbsimple):
     """
     测试获取电影详情
@@ -151,14 +151,7 @@ async def test_get_movie_details(mocker, mock_tmdbsimple):
     }
     
     # 模拟tmdbsimple库
-    mocker.patch("app.core.tmdb.tmdbsimple", mock_tmdbsimple["tmdb"])
-    
-    # 模拟asyncio.to_thread
-    async def async_to_thread_mock(func, *args, **kwargs):
-        await asyncio.sleep(0)
-        return func(*args, **kwargs)
-
-    mocker.patch("app.core.tmdb.asyncio.to_thread", side_effect=async_to_thread_mock)
+    mocker.patch.object(tmdb, "tmdbsimple", mock_tmdbsimple["tmdb"])
     
     # 调用被测函数
     result = await tmdb.get_movie_details(movie_id)
@@ -175,7 +168,6 @@ async def test_get_movie_details(mocker, mock_tmdbsimple):
     mock_movies.info.assert_called_once()
 
 
-@pytest.mark.asyncio
 async def test_api_retry_mechanism(mocker, mock_tmdbsimple):
     """
     测试API调用失败与重试机制
@@ -192,9 +184,9 @@ async def test_api_retry_mechanism(mocker, mock_tmdbsimple):
     # 设置前两次调用抛出异常，第三次成功
     mock_search.movie.side_effect = [
         # 第一次调用：请求超时
-        requests.exceptions.Timeout("Connection timed out"),
+        _TIMEOUT,
         # 第二次调用：服务器错误
-        requests.exceptions.HTTPError("500 Server Error"),
+        _HTTP_ERROR,
         # 第三次调用：成功
         {"page": 1, "total_results": 1}
     ]
@@ -209,14 +201,7 @@ async def test_api_retry_mechanism(mocker, mock_tmdbsimple):
     }]
     
     # 模拟tmdbsimple库
-    mocker.patch("app.core.tmdb.tmdbsimple", mock_tmdbsimple["tmdb"])
-    
-    # 模拟asyncio.to_thread，确保它能正确传播异常
-    async def async_to_thread_mock(func, *args, **kwargs):
-        # 这个mock直接调用函数，这样异常就可以被tenacity捕获
-        return func(*args, **kwargs)
-
-    mocker.patch("app.core.tmdb.asyncio.to_thread", side_effect=async_to_thread_mock)
+    mocker.patch.object(tmdb, "tmdbsimple", mock_tmdbsimple["tmdb"])
     
     # 调用被测函数
     result = await tmdb.search_movie(llm_data)
@@ -230,7 +215,6 @@ async def test_api_retry_mechanism(mocker, mock_tmdbsimple):
     assert mock_search.movie.call_count == 3
 
 
-@pytest.mark.asyncio
 async def test_tmdb_semaphore_limit(mocker):
     """
     测试TMDB信号量机制
@@ -267,16 +251,21 @@ async def test_tmdb_semaphore_limit(mocker):
     real_semaphore.release = tracked_release
     
     # 模拟TMDB_SEMAPHORE
-    mocker.patch("app.core.tmdb.TMDB_SEMAPHORE", real_semaphore)
+    mocker.patch.object(tmdb, "TMDB_SEMAPHORE", real_semaphore)
+    
+    # 信号量占满（10个请求同时在内部）时放行，代替固定时长的 sleep
+    saturated = asyncio.Event()
     
-    # 模拟search_movie函数，使其在信号量内部延迟一段时间
+    # 模拟search_movie函数，使其在信号量内部等待并发数达到上限
     async def mock_search_movie(data):
         async with tmdb.TMDB_SEMAPHORE:
-            # 模拟API调用的延迟
-            await asyncio.sleep(0.1)
+            if current_concurrent >= 10:
+                saturated.set()
+            # 设置超时：并发上限回退到 10 以下时事件永远不会触发，超时使测试失败而不是挂起
+            await asyncio.wait_for(saturated.wait(), timeout=1.0)
             return {"id": 12345, "title": data["title"]}
     
-    mocker.patch("app.core.tmdb.search_movie", mock_search_movie)
+    mocker.patch.object(tmdb, "search_movie", mock_search_movie)
     
     # 创建15个并发请求
     tasks = []
@@ -292,10 +281,10 @@ async def test_tmdb_semaphore_limit(mocker):
     
     # 验证并发限制
     assert max_concurrent <= 10, f"并发请求数超过了限制：{max_concurrent} > 10"
+    assert max_concurrent == 10, "信号量应允许10个请求同时进入"
     assert acquire_count == 15, "应该有15个请求尝试获取信号量"
 
 
-@pytest.mark.asyncio
 async def test_search_media_hybrid_search_success(mocker):
     """
     测试TMDB混合搜索功能：LLM错误识别类型时的备用搜索
@@ -311,11 +300,11 @@ async def test_search_media_hybrid_search_success(mocker):
     }
     
     # 模拟TV剧搜索失败（返回None）
-    mock_search_tv = mocker.patch("app.core.tmdb.search_tv_by_title_and_year")
+    mock_search_tv = mocker.patch.object(tmdb, "search_tv_by_title_and_year")
     mock_search_tv.return_value = None
     
     # 模拟电影搜索成功
-    mock_search_movie = mocker.patch("app.core.tmdb.search_movie_by_title_and_year")
+    mock_search_movie = mocker.patch.object(tmdb, "search_movie_by_title_and_year")
     mock_search_movie.return_value = {
         "id": 27205,
         "title": "Inception",
@@ -338,7 +327,6 @@ async def test_search_media_hybrid_search_success(mocker):
     mock_search_movie.assert_called_once_with("Inception", 2010)
 
 
-@pytest.mark.asyncio 
 async def test_search_media_hybrid_search_both_fail(mocker):
     """
     测试TMDB混合搜索功能：主类型和备用类型都搜索失败
@@ -354,11 +342,11 @@ async def test_search_media_hybrid_search_both_fail(mocker):
     }
     
     # 模拟电影搜索失败
-    mock_search_movie = mocker.patch("app.core.tmdb.search_movie_by_title_and_year")
+    mock_search_movie = mocker.patch.object(tmdb, "search_movie_by_title_and_year")
     mock_search_movie.return_value = None
     
     # 模拟TV剧搜索也失败
-    mock_search_tv = mocker.patch("app.core.tmdb.search_tv_by_title_and_year") 
+    mock_search_tv = mocker.patch.object(tmdb, "search_tv_by_title_and_year") 
     mock_search_tv.return_value = None
     
     # 调用被测函数
@@ -372,7 +360,6 @@ async def test_search_media_hybrid_search_both_fail(mocker):
     mock_search_tv.assert_called_once_with("Non-existent Movie", 1999)
 
 
-@pytest.mark.asyncio
 async def test_search_media_primary_type_success(mocker):
     """
     测试TMDB混合搜索功能：主类型搜索成功的情况
@@ -388,7 +375,7 @@ async def test_search_media_primary_type_success(mocker):
     }
     
     # 模拟电影搜索成功
-    mock_search_movie = mocker.patch("app.core.tmdb.search_movie_by_title_and_year")
+    mock_search_movie = mocker.patch.object(tmdb, "search_movie_by_title_and_year")
     mock_search_movie.return_value = {
         "id": 603,
         "title": "The Matrix",
@@ -398,7 +385,7 @@ async def test_search_media_primary_type_success(mocker):
     }
     
     # 模拟TV剧搜索（不应被调用）
-    mock_search_tv = mocker.patch("app.core.tmdb.search_tv_by_title_and_year")
+    mock_search_tv = mocker.patch.object(tmdb, "search_tv_by_title_and_year")
     
     # 调用被测函数
     result = await tmdb.search_media(llm_data)
@@ -1,105 +1,137 @@
 """测试文件校验功能"""
 
-import tempfile
+import os
 from pathlib import Path
 from unittest.mock import patch
-from app.services.media.scanner import _validate_file
+
+import pytest
+
+from app.services.media.scanner import _validate_file, _validate_files_batch
+
+ALLOWED_EXTENSIONS = frozenset((".mp4", ".mkv", ".avi"))
+
+# 模块内共享的测试文件：文件名 -> 大小（字节）
+MEDIA_FILES = {
+    "valid.mp4": 1024,
+    "small.mp4": 100,
+    "empty.mp4": 0,
+    "upper.MP4": 0,
+    "notes.txt": 0,
+}
+
+
+@pytest.fixture(scope="module")
+def media_dir(tmp_path_factory) -> Path:
+    """模块级临时目录：一次性创建所有测试文件
+
+    用 os.truncate 设定文件大小（稀疏文件），无需在用户态写入数据。
+    """
+    directory = tmp_path_factory.mktemp("validate")
+    for name, size in MEDIA_FILES.items():
+        path = directory / name
+        path.touch()
+        os.truncate(path, size)
+    return directory
 
 
 class TestValidateFile:
     """测试 _validate_file 函数"""
     
-    def test_validate_file_extension_valid(self):
+    def test_validate_file_extension_valid(self, media_dir):
         """测试有效扩展名的文件校验"""
-        allowed_extensions = {".mp4", ".mkv", ".avi"}
-        
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(suffix=".mp4") as tmp_file:
-            file_path = Path(tmp_file.name)
-            is_valid, message = _validate_file(file_path, allowed_extensions, min_size_bytes=0)
-            assert is_valid is True
-            assert message == ""
+        is_valid, message = _validate_file(media_dir / "empty.mp4", ALLOWED_EXTENSIONS, min_size_bytes=0)
+        assert is_valid is True
+        assert message == ""
     
-    def test_validate_file_extension_invalid(self):
+    def test_validate_file_extension_invalid(self, media_dir):
         """测试无效扩展名的文件校验"""
-        allowed_extensions = {".mp4", ".mkv", ".avi"}
-        
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(suffix=".txt") as tmp_file:
-            file_path = Path(tmp_file.name)
-            is_valid, message = _validate_file(file_path, allowed_extensions, min_size_bytes=0)
-            assert is_valid is False
-            assert "扩展名" in message
+        is_valid, message = _validate_file(media_dir / "notes.txt", ALLOWED_EXTENSIONS, min_size_bytes=0)
+        assert is_valid is False
+        assert "扩展名" in message
     
-    def test_validate_file_extension_case_insensitive(self):
+    def test_validate_file_extension_case_insensitive(self, media_dir):
         """测试扩展名大小写不敏感"""
-        allowed_extensions = {".mp4", ".mkv", ".avi"}
-        
-        # 创建临时文件
-        with tempfile.NamedTemporaryFile(suffix=".MP4") as tmp_file:
-            file_path = Path(tmp_file.name)
-            is_valid, message = _validate_file(file_path, allowed_extensions, min_size_bytes=0)
-            assert is_valid is True
-            assert message == ""
+        is_valid, message = _validate_file(media_dir / "upper.MP4", ALLOWED_EXTENSIONS, min_size_bytes=0)
+        assert is_valid is True
+        assert message == ""
     
-    def test_validate_file_size_valid(self):
+    def test_validate_file_size_valid(self, media_dir):
         """测试文件大小校验通过"""
-        allowed_extensions = {".mp4", ".mkv", ".avi"}
-        
-        # 创建临时文件并写入数据
-        with tempfile.NamedTemporaryFile(suffix=".mp4") as tmp_file:
-            tmp_file.write(b"x" * 1024)  # 1KB
-            tmp_file.flush()
-            file_path = Path(tmp_file.name)
-            
-            is_valid, message = _validate_file(file_path, allowed_extensions, min_size_bytes=512)  # 最小512B
-            assert is_valid is True
-            assert message == ""
+        # 1KB 文件，最小512B
+        is_valid, message = _validate_file(media_dir / "valid.mp4", ALLOWED_EXTENSIONS, min_size_bytes=512)
+        assert is_valid is True
+        assert message == ""
     
-    def test_validate_file_size_too_small(self):
+    def test_validate_file_size_too_small(self, media_dir):
         """测试文件太小被拒绝"""
-        allowed_extensions = {".mp4", ".mkv", ".avi"}
-        
-        # 创建临时文件并写入少量数据
-        with tempfile.NamedTemporaryFile(suffix=".mp4") as tmp_file:
-            tmp_file.write(b"x" * 100)  # 100B
-            tmp_file.flush()
-            file_path = Path(tmp_file.name)
-            
-            is_valid, message = _validate_file(file_path, allowed_extensions, min_size_bytes=1024)  # 最小1KB
-            assert is_valid is False
-            assert "文件大小" in message
+        # 100B 文件，最小1KB
+        is_valid, message = _validate_file(media_dir / "small.mp4", ALLOWED_EXTENSIONS, min_size_bytes=1024)
+        assert is_valid is False
+        assert "文件大小" in message
     
-    def test_validate_file_size_zero_min_allowed(self):
+    def test_validate_file_size_zero_min_allowed(self, media_dir):
         """测试最小大小为0时不检查大小"""
-        allowed_extensions = {".mp4", ".mkv", ".avi"}
-        
-        # 创建空文件
-        with tempfile.NamedTemporaryFile(suffix=".mp4") as tmp_file:
-            file_path = Path(tmp_file.name)
-            
-            is_valid, message = _validate_file(file_path, allowed_extensions, min_size_bytes=0)
-            assert is_valid is True
-            assert message == ""
+        is_valid, message = _validate_file(media_dir / "empty.mp4", ALLOWED_EXTENSIONS, min_size_bytes=0)
+        assert is_valid is True
+        assert message == ""
     
     def test_validate_file_not_exists(self):
         """测试文件不存在的情况"""
-        allowed_extensions = {".mp4", ".mkv", ".avi"}
         file_path = Path("/non/existent/file.mp4")
         
-        is_valid, message = _validate_file(file_path, allowed_extensions, min_size_bytes=0)
+        is_valid, message = _validate_file(file_path, ALLOWED_EXTENSIONS, min_size_bytes=0)
+        assert is_valid is False
+        assert "文件不存在" in message
+    
+    def test_validate_file_not_regular(self, media_dir):
+        """测试扩展名匹配但不是普通文件（如目录）的情况"""
+        directory = media_dir / "folder.mkv"
+        directory.mkdir(exist_ok=True)
+        
+        is_valid, message = _validate_file(directory, ALLOWED_EXTENSIONS, min_size_bytes=0)
         assert is_valid is False
-        assert "文件不存在" in message or "无法获取文件信息" in message
+        assert "不是普通文件" in message
     
-    def test_validate_file_stat_error(self):
+    def test_validate_file_stat_error(self, media_dir):
         """测试获取文件信息失败的情况"""
-        allowed_extensions = {".mp4", ".mkv", ".avi"}
+        # 模拟 os.stat() 抛出异常
+        with patch.object(os, 'stat', side_effect=PermissionError("Permission denied")):
+            is_valid, message = _validate_file(media_dir / "valid.mp4", ALLOWED_EXTENSIONS, min_size_bytes=0)
+            assert is_valid is False
+            assert "无法获取文件信息" in message
+            assert "Permission denied" in message
+    
+    def test_validate_file_with_precomputed_stat(self, media_dir):
+        """测试传入已有的文件信息时不再调用 stat()"""
+        file_path = media_dir / "valid.mp4"
+        stat_result = file_path.stat()
+        
+        with patch.object(os, 'stat', side_effect=AssertionError("不应再次调用 stat")):
+            is_valid, message = _validate_file(
+                file_path, ALLOWED_EXTENSIONS, min_size_bytes=512, stat_result=stat_result
+            )
+            assert is_valid is True
+            assert message == ""
+    
+    def test_validate_files_batch_partial_failure(self, tmp_path):
+        """测试批量校验：单个文件失败不影响其他文件，结果顺序与输入一致"""
+        video = tmp_path / "movie.mp4"
+        video.touch()
+        os.truncate(video, 1024)
+        text = tmp_path / "readme.txt"
+        text.touch()
+        # 悬空软链接：目录项存在但 stat 失败
+        missing = tmp_path / "missing.mkv"
+        missing.symlink_to(tmp_path / "gone.mkv")
+        
+        with os.scandir(tmp_path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        
+        results = _validate_files_batch(entries, ALLOWED_EXTENSIONS, min_size_bytes=0)
+        by_name = {path.name: (is_valid, reason, stat_result) for path, is_valid, reason, stat_result in results}
         
-        with tempfile.NamedTemporaryFile(suffix=".mp4") as tmp_file:
-            file_path = Path(tmp_file.name)
-            
-            # 模拟 stat() 抛出异常
-            with patch.object(Path, 'stat', side_effect=OSError("Permission denied")):
-                is_valid, message = _validate_file(file_path, allowed_extensions, min_size_bytes=0)
-                assert is_valid is False
-                assert "无法获取文件信息" in message 
\ No newline at end of file
+        assert [path for path, *_ in results] == [missing, video, text]
+        assert by_name["movie.mp4"][:2] == (True, "")
+        assert by_name["movie.mp4"][2].st_size == 1024
+        assert by_name["readme.txt"][0] is False and "扩展名" in by_name["readme.txt"][1]
+        assert by_name["missing.mkv"][0] is False and "文件不存在" in by_name["missing.mkv"][1]
@@ -0,0 +1,127 @@
+"""
+worker.py 单元测试
+
+测试 Worker 数量的确定：显式配置直接使用，0 时按 CPU 核心数与文件描述符上限自动计算；
+测试 worker_loop：批量更新状态、逐个处理、单个文件失败不影响同批其他文件、每个任务恰好 task_done 一次
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from app.config import Settings
+from app.services.media import worker
+from app.services.media.types import ProcessResult
+from app.services.media.worker import resolve_worker_count
+
+
+class TestResolveWorkerCount:
+    """测试 resolve_worker_count 函数"""
+
+    def test_explicit_count_is_used(self, mocker):
+        """测试显式配置的数量不做调整"""
+        mocker.patch.object(os, "cpu_count", return_value=64)
+        assert resolve_worker_count(3) == 3
+
+    def test_auto_limited_by_cpu(self, mocker):
+        """测试文件描述符充足时按 CPU 核心数 * 4 计算"""
+        resource = pytest.importorskip("resource")
+        mocker.patch.object(os, "cpu_count", return_value=2)
+        mocker.patch.object(resource, "getrlimit", return_value=(65536, 65536))
+        assert resolve_worker_count(0) == 8
+
+    def test_auto_limited_by_fd(self, mocker):
+        """测试文件描述符上限较低时按上限 // 16 计算"""
+        resource = pytest.importorskip("resource")
+        mocker.patch.object(os, "cpu_count", return_value=16)
+        mocker.patch.object(resource, "getrlimit", return_value=(96, 4096))
+        assert resolve_worker_count(0) == 6
+
+    def test_auto_clamped_to_max(self, mocker):
+        """测试多核主机上自动计算的结果不超过显式配置允许的最大值"""
+        resource = pytest.importorskip("resource")
+        mocker.patch.object(os, "cpu_count", return_value=16)
+        mocker.patch.object(resource, "getrlimit", return_value=(65536, 65536))
+        assert resolve_worker_count(0) == worker.AUTO_MAX_WORKERS
+
+    def test_auto_max_matches_config_bound(self):
+        """测试自动计算的上限与 WORKER_COUNT 配置项的 le 约束一致"""
+        bounds = [m.le for m in Settings.model_fields["WORKER_COUNT"].metadata if hasattr(m, "le")]
+        assert bounds == [worker.AUTO_MAX_WORKERS]
+
+    def test_auto_at_least_one(self, mocker):
+        """测试 CPU 核心数未知且文件描述符很少时至少启动一个 Worker"""
+        resource = pytest.importorskip("resource")
+        mocker.patch.object(os, "cpu_count", return_value=None)
+        mocker.patch.object(resource, "getrlimit", return_value=(8, 8))
+        assert resolve_worker_count(0) == 1
+
+
+class TestWorkerLoop:
+    """测试 worker_loop 函数"""
+
+    @staticmethod
+    async def _run_until_drained(queue, db_session_factory, settings):
+        """启动一个 Worker，等队列中的任务全部 task_done 后取消它"""
+        task = asyncio.create_task(worker.worker_loop(1, queue, db_session_factory, settings))
+        try:
+            await asyncio.wait_for(queue.join(), timeout=1.0)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    @pytest.mark.asyncio
+    async def test_worker_loop_isolates_failures_and_marks_tasks_done(self, mocker):
+        """测试同批中一个文件抛出异常时其他文件照常处理，且每个任务恰好 task_done 一次"""
+        processed = []
+
+        async def fake_process(media_file_id, db_session_factory, settings, *, mark_processing=True):
+            assert mark_processing is False
+            if media_file_id == 2:
+                raise RuntimeError("boom")
+            processed.append(media_file_id)
+            return ProcessResult(success=True, message="处理成功", media_file_id=media_file_id)
+
+        mock_bulk = mocker.patch.object(worker, "set_processing_bulk")
+        mocker.patch.object(worker, "process_media_file", side_effect=fake_process)
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for media_file_id in (1, 2, 3):
+            queue.put_nowait(media_file_id)
+        task_done = mocker.spy(queue, "task_done")
+
+        await self._run_until_drained(queue, mocker.sentinel.db_session_factory, mocker.sentinel.settings)
+
+        assert processed == [1, 3]
+        assert task_done.call_count == 3
+        mock_bulk.assert_called_once_with(mocker.sentinel.db_session_factory, [1, 2, 3])
+
+    @pytest.mark.asyncio
+    async def test_worker_loop_processes_batch_sequentially(self, mocker):
+        """测试单个 Worker 每批最多取出 WORKER_BATCH_SIZE 个文件，且同一时刻只处理一个文件"""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def fake_process(media_file_id, db_session_factory, settings, *, mark_processing=True):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return ProcessResult(success=True, message="处理成功", media_file_id=media_file_id)
+
+        mock_bulk = mocker.patch.object(worker, "set_processing_bulk")
+        mocker.patch.object(worker, "process_media_file", side_effect=fake_process)
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        total = worker.WORKER_BATCH_SIZE * 2 + 1
+        for media_file_id in range(total):
+            queue.put_nowait(media_file_id)
+
+        await self._run_until_drained(queue, mocker.sentinel.db_session_factory, mocker.sentinel.settings)
+
+        assert max_in_flight == 1
+        assert [len(c.args[1]) for c in mock_bulk.call_args_list] == [
+            worker.WORKER_BATCH_SIZE, worker.WORKER_BATCH_SIZE, 1
+        ]
@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import os
+import sys
 
 from loguru import logger
 from app.config import settings, cleanup_deprecated_configs
@@ -10,19 +12,28 @@ import asyncio
 from app.db import create_db_and_tables, get_session_factory
 from app.services.media.scanner import background_scanner_task
 from app.services.media.producer import producer_loop
-from app.services.media.processor import process_media_file
-from app.services.media.status_manager import set_processing
-from sqlmodel import select
+from app.services.media.worker import resolve_worker_count, worker_loop
+from sqlmodel import func, select, update
 from app.core.models import MediaFile, FileStatus
 
 # 配置日志
+# 以字符串传入格式：loguru 在 add() 时按日志级别各编译一次颜色标记，之后每条记录只做格式化；
+# 可调用对象的返回值虽然也会被缓存解析，但每条记录要多一次函数调用和一次缓存查找
+LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+    "<level>{level}</level> | "
+    "{extra} {message}"
+)
+
+# enqueue=True：日志记录经队列交给后台线程写出，事件循环中的 logger 调用不再阻塞在 write 上
 logger.remove()
 logger.add(
-    sink=lambda msg: print(msg, end=""),
+    sys.stdout,
     level=settings.LOG_LEVEL.value,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
-            "<level>{level}</level> | "
-            "{extra} {message}"
+    format=LOG_FORMAT,
+    enqueue=True,
+    backtrace=False,
+    diagnose=False
 )
 
 
@@ -62,89 +73,49 @@ async def _apply_settings_side_effects(settings_instance) -> None:
         logger.error(f"执行配置副作用处理时出错: {e}")
 
 
-async def worker_loop(
-    worker_id: int,
-    queue: asyncio.Queue[int],
-    db_session_factory,
-    settings
-) -> None:
-    """工作者协程循环
-    
-    从队列中获取文件 ID，将状态更新为 PROCESSING，然后处理文件。
-    
-    Args:
-        worker_id: 工作者ID（用于日志标识）
-        queue: 包含文件ID的异步队列
-        db_session_factory: 数据库会话工厂
-        settings: 应用配置
-    """
-    worker_logger = logger.bind(worker_id=worker_id)
-    worker_logger.info(f"Worker-{worker_id} 启动")
-    
-    while True:
-        try:
-            # 从队列中获取文件 ID
-            media_file_id = await queue.get()
-            worker_logger.info(f"Worker-{worker_id} 获取到任务: media_file_id={media_file_id}")
-            
-            try:
-                # 将状态从 QUEUED 更新为 PROCESSING
-                set_processing(db_session_factory, media_file_id)
-                worker_logger.info(f"Worker-{worker_id} 已将文件 {media_file_id} 状态更新为 PROCESSING")
-                
-                # 处理媒体文件
-                result = await process_media_file(media_file_id, db_session_factory, settings)
-                
-                if result.success:
-                    worker_logger.info(f"Worker-{worker_id} 成功处理文件 {media_file_id}")
-                else:
-                    worker_logger.warning(f"Worker-{worker_id} 处理文件 {media_file_id} 失败: {result.message}")
-                    
-            except Exception as e:
-                worker_logger.error(f"Worker-{worker_id} 处理文件 {media_file_id} 时发生异常: {e}")
-            finally:
-                # 标记任务完成
-                queue.task_done()
-                
-        except asyncio.CancelledError:
-            worker_logger.info(f"Worker-{worker_id} 被取消")
-            break
-        except Exception as e:
-            worker_logger.error(f"Worker-{worker_id} 发生异常: {e}")
-            await asyncio.sleep(1)  # 避免快速循环
+def _log_background_task_exit(task: asyncio.Task) -> None:
+    """后台任务结束回调：记录非取消导致的异常退出"""
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.opt(exception=exc).error(f"后台任务 {task.get_name()} 异常退出: {exc}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("应用启动，开始初始化...")
-    create_db_and_tables()
+    # 建表与清理废弃配置都是阻塞的 SQLite IO，放到线程中执行，不占用事件循环；
+    # 清理需要读取 configitem 表，必须在建表之后，因此二者保持先后顺序
+    await asyncio.to_thread(create_db_and_tables)
     logger.info("数据库和表初始化完成")
     
     # 清理数据库中的废弃配置项
     logger.info("开始清理废弃配置项...")
-    cleanup_deprecated_configs()
+    await asyncio.to_thread(cleanup_deprecated_configs)
     logger.info("废弃配置项清理完成")
     
-    # 🔧 修复：确保数据库配置正确加载
-    logger.info("重新加载配置以确保数据库配置生效...")
-    try:
-        from app.config import get_settings
-        updated_settings = get_settings(force_reload=True)
-        logger.info("配置重载成功，数据库配置已加载")
-        
-        # 应用配置后的副作用处理
-        await _apply_settings_side_effects(updated_settings)
-        
-    except Exception as e:
-        logger.error(f"配置重载失败，将使用默认配置: {e}")
-        # 继续启动，但使用默认配置
-    
     # ------------------------------------------------------------------
     # 1) 创建数据库会话工厂
     # ------------------------------------------------------------------
     db_session_factory = get_session_factory()
 
+    # 🔧 修复：确保数据库配置正确加载
+    async def _reload_settings() -> None:
+        logger.info("重新加载配置以确保数据库配置生效...")
+        try:
+            from app.config import get_settings
+            updated_settings = await asyncio.to_thread(get_settings, force_reload=True)
+            logger.info("配置重载成功，数据库配置已加载")
+            
+            # 应用配置后的副作用处理
+            await _apply_settings_side_effects(updated_settings)
+            
+        except Exception as e:
+            logger.error(f"配置重载失败，将使用默认配置: {e}")
+            # 继续启动，但使用默认配置
+
     # ------------------------------------------------------------------
     # 2) 启动时恢复被意外中断的任务
     #    将所有 QUEUED / PROCESSING 状态的任务重置为 PENDING，
@@ -155,25 +126,22 @@ async def lifespan(app: FastAPI):
         """在独立线程里执行恢复逻辑，返回受影响记录数"""
 
         def _sync_recover() -> int:
+            stuck = MediaFile.status.in_([FileStatus.QUEUED, FileStatus.PROCESSING])
             with db_session_factory() as session:
-                stuck_tasks = session.exec(
-                    select(MediaFile).where(
-                        MediaFile.status.in_([FileStatus.QUEUED, FileStatus.PROCESSING])
-                    )
-                ).all()
-
-                if not stuck_tasks:
+                # 先用 COUNT(*) 判断是否有卡住任务：正常关闭后通常为 0，此时无需开启写事务
+                if not session.exec(select(func.count()).select_from(MediaFile).where(stuck)).one():
                     return 0
-
-                for task in stuck_tasks:
-                    task.status = FileStatus.PENDING
-
+                # 单条 UPDATE 完成重置，无需先把记录加载到内存
+                result = session.exec(
+                    update(MediaFile).where(stuck).values(status=FileStatus.PENDING)
+                )
                 session.commit()
-                return len(stuck_tasks)
+                return result.rowcount
 
         return await asyncio.to_thread(_sync_recover)
 
-    recovered = await _recover_stuck_tasks()
+    # 配置重载只读取 configitem 表，任务恢复只更新 mediafile 表，二者互不依赖，并行执行
+    _, recovered = await asyncio.gather(_reload_settings(), _recover_stuck_tasks())
     if recovered:
         logger.warning(f"启动恢复: 已将 {recovered} 个卡住任务重置为 PENDING")
     else:
@@ -187,7 +155,7 @@ async def lifespan(app: FastAPI):
     app.state.media_queue = media_file_queue
     logger.info("队列已保存到app.state.media_queue")
     
-    # 启动后台任务
+    # 启动后台任务：各任务相互独立，单个任务异常退出不会连带取消其他任务
     background_tasks = []
     
     # 1. 启动 Scanner（不传递队列，仅负责扫描和入库）
@@ -197,9 +165,9 @@ async def lifespan(app: FastAPI):
             settings=settings,
             stop_event=None,
             media_queue=None  # 重要：不传递队列
-        )
+        ),
+        name="scanner"
     )
-    scanner_task.set_name("scanner")
     background_tasks.append(scanner_task)
     logger.info("启动 Scanner 任务（仅负责扫描和入库）")
     
@@ -210,46 +178,49 @@ async def lifespan(app: FastAPI):
             queue=media_file_queue,
             batch_size=settings.PRODUCER_BATCH_SIZE,
             interval_seconds=settings.PRODUCER_INTERVAL_SECONDS
-        )
+        ),
+        name="producer"
     )
-    producer_task.set_name("producer")
     background_tasks.append(producer_task)
     logger.info(f"启动 Producer 任务（批量大小: {settings.PRODUCER_BATCH_SIZE}, 间隔: {settings.PRODUCER_INTERVAL_SECONDS}秒）")
     
     # 3. 启动 Workers（从队列获取文件并处理）
-    worker_tasks = []
-    for i in range(settings.WORKER_COUNT):
+    worker_count = resolve_worker_count(settings.WORKER_COUNT)
+    if settings.WORKER_COUNT == 0:
+        logger.info(f"WORKER_COUNT=0，自动确定 Worker 数量为 {worker_count}（CPU 核心数: {os.cpu_count()}）")
+    for i in range(worker_count):
         worker_task = asyncio.create_task(
             worker_loop(
                 worker_id=i + 1,
                 queue=media_file_queue,
                 db_session_factory=db_session_factory,
                 settings=settings
-            )
+            ),
+            name=f"worker-{i+1}"
         )
-        worker_task.set_name(f"worker-{i+1}")
-        worker_tasks.append(worker_task)
         background_tasks.append(worker_task)
         logger.info(f"启动 Worker-{i+1}")
     
-    logger.info(f"所有后台任务启动完成 - Scanner: 1, Producer: 1, Workers: {settings.WORKER_COUNT}")
+    # 运行期间任务异常退出时立即记录，而不是等到关闭时才发现
+    for task in background_tasks:
+        task.add_done_callback(_log_background_task_exit)
+    
+    logger.info(f"所有后台任务启动完成 - Scanner: 1, Producer: 1, Workers: {worker_count}")
     
     yield
     
     # Shutdown
     logger.info("正在关闭所有后台任务...")
     
-    # 取消所有后台任务
+    # 取消所有后台任务并等待其结束；return_exceptions=True 保证单个任务的异常不会中断关闭流程
     for task in background_tasks:
         task.cancel()
-    
-    # 等待所有任务完成
-    try:
-        await asyncio.gather(*background_tasks, return_exceptions=True)
-    except Exception as e:
-        logger.error(f"关闭任务时发生异常: {e}")
+    await asyncio.gather(*background_tasks, return_exceptions=True)
     
     logger.info("所有后台任务已关闭")
+    
+    # 等待后台日志线程写完队列中剩余的记录
+    await logger.complete()
 
 
 app = FastAPI(title="ClearMedia API", lifespan=lifespan, openapi_tags=tags_metadata)